@@ -4,64 +4,97 @@ import json
 import csv
 import html as _html
 from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 import requests
-from bs4 import BeautifulSoup
-import time
-
-
-# --- retry helper for idempotent HTTP requests ---
-def request_with_retry(session: requests.Session, method: str, url: str,
-                       *, max_attempts: int = 7,
-                       base_sleep: float = 0.8,
-                       timeout: float = 60,
-                       retry_http_status=(500, 502, 503, 504),
-                       debug: bool = False,
-                       **kwargs) -> requests.Response:
-    """
-    Retry on server errors, timeouts, and transient network faults.
-    Exponential backoff with jitter. Only for idempotent requests.
-    """
-    attempt = 0
-    last_err = None
-    while attempt < max_attempts:
-        attempt += 1
-        try:
-            resp = session.request(method, url, timeout=timeout, **kwargs)
-            if resp.status_code in retry_http_status:
-                if debug:
-                    print(f"[DEBUG] {url} -> HTTP {resp.status_code} on attempt {attempt}/{max_attempts}")
-                raise requests.exceptions.HTTPError(f"{resp.status_code} Server Error", response=resp)
-            return resp
-        except (requests.exceptions.Timeout,
-                requests.exceptions.ConnectionError,
-                requests.exceptions.HTTPError) as e:
-            last_err = e
-            if attempt >= max_attempts:
-                break
-            sleep_s = base_sleep * (2 ** (attempt - 1)) + random.random() * base_sleep
-            if debug:
-                print(f"[DEBUG] Retry {attempt}/{max_attempts} after error: {e}. Sleep {sleep_s:.1f}s")
-            time.sleep(sleep_s)
-    if last_err:
-        raise last_err
-    raise RuntimeError("request_with_retry failed without exception")
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from bs4 import BeautifulSoup, SoupStrainer
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
-import random
-from typing import Optional
 
 LOGIN_URL = "http://eecmobile1.fortiddns.com/eec/Login.aspx"
 MAP_URL = "http://eecmobile1.fortiddns.com/eec/Raingauge_Monitor_Map.aspx"
 SUMMARY_URL = "http://eecmobile1.fortiddns.com/eec/Raingauge_Summary_Station.aspx"
 ALL_LATEST_URL = "http://eecmobile1.fortiddns.com/eec/Raingauge_All_Lastest.aspx"
 
+# regex ที่ใช้ซ้ำใน hot loop คอมไพล์ไว้ครั้งเดียวตอนโหลดโมดูล
+_RE_GCODE = re.compile(r'^G\d+$')
+_RE_SETMAP = re.compile(r'SetMap\s*\(')
+_RE_TAG = re.compile(r'<[^>]+>')
+# ดึงข้อมูลจากตาราง All_Latest ระดับ string ตรงๆ โครงสร้าง ASPX คงที่พอให้ไม่ต้องสร้าง DOM
+_RE_ROW = re.compile(r'<tr\b[^>]*>(.*?)</tr>', re.S | re.I)
+_RE_CELL = re.compile(r'<td\b[^>]*>(.*?)</td>', re.S | re.I)
+_RE_ROW_G = re.compile(r'>\s*(G\d+)\s*<')
+_RE_ROW_IMG = re.compile(
+    r'<img[^>]+id="[^"]*Img_Status[^"]*"[^>]+src="([^"]+)"(?:[^>]+alt="([^"]*)")?', re.I)
+
+# token จาก status_text → สถานะมาตรฐาน (lookup ครั้งเดียวแทน substring scan หลายรอบ)
+_TEXT_STATUS = {
+    "ONLINE": "ONLINE", "NORMAL": "ONLINE", "ACTIVE": "ONLINE",
+    "OFFLINE": "OFFLINE",
+    "TIMEOUT": "TIMEOUT",
+    "DISCONNECT": "DISCONNECT",
+}
+_RE_NUM = re.compile(r'([+-]?\d+(\.\d+)?)')
+_RE_RAINGAUGE = re.compile(r'raingauge[_-]\d+(\.png)?')
+_RE_STATUS_TOK = re.compile(r'status[_-](\w+)', re.I)
+
+def _split_opts(body):
+    """แบ่ง option string ที่ comma ระดับบนสุด (สแกนเชิงเส้น ไม่มี regex backtracking)"""
+    parts = []
+    start = 0
+    depth = 0
+    in_q = None
+    for i, c in enumerate(body):
+        if in_q:
+            if c == in_q and body[i-1] != '\\':
+                in_q = None
+        elif c in "\"'":
+            in_q = c
+        elif c == '{':
+            depth += 1
+        elif c == '}':
+            depth -= 1
+        elif c == ',' and depth == 0:
+            parts.append(body[start:i])
+            start = i + 1
+    parts.append(body[start:])
+    return parts
+# จับคีย์เวิร์ดสถานะทั้งหมดในสแกนเดียว ชื่อกลุ่มที่แมตช์คือสถานะที่ต้องการ
+_RE_STATUS = re.compile(
+    r'(?P<ONLINE>online|green|_1|normal)'
+    r'|(?P<OFFLINE>offline|red|_0)'
+    r'|(?P<TIMEOUT>timeout|yellow|orange|warning)'
+    r'|(?P<DISCONNECT>disconnect|gr[ea]y)'
+    r'|(?P<REPAIR>repair|maintenance)', re.I)
+
+# จับคู่ Key: value ทุกฟิลด์ใน info popup ด้วย finditer ครั้งเดียว
+# ค่าจบที่ '<' ทำให้ไม่ต้องลอกแท็ก/<br> ออกก่อน
+_RE_KV = re.compile(
+    r'(Code|Rain|Date|Temperature|Temp|Humidity|Battery|Solar[^:<\n]*|Status)'
+    r'\s*:\s*([^<\n]+)', re.I)
+
 # ---------------- Login ----------------
+_INPUT_STRAINER = SoupStrainer("input")
+
 def _inputs(html):
-    soup = BeautifulSoup(html, "html.parser")
+    # parse เฉพาะแท็ก <input> ไม่ต้องสร้าง tree ของทั้งหน้า login
+    soup = BeautifulSoup(html, "lxml", parse_only=_INPUT_STRAINER)
     return {i.get("name"): i.get("value", "") for i in soup.find_all("input") if i.get("name")}
 
 def login(user, password, debug=False):
     s = requests.Session()
     s.headers.update({"User-Agent": "Mozilla/5.0 (EECLoginBot/1.0)"})
+    # retry + connection pool ระดับ urllib3 ครอบทุก request ของ session นี้
+    retry = Retry(total=7, backoff_factor=0.8,
+                  status_forcelist=(500, 502, 503, 504),
+                  allowed_methods=frozenset(["GET", "POST"]))
+    s.mount("http://", HTTPAdapter(max_retries=retry, pool_connections=16, pool_maxsize=16))
     if debug:
         print("[DEBUG] GET", LOGIN_URL)
     r = s.get(LOGIN_URL, timeout=60)
@@ -79,44 +112,48 @@ def login(user, password, debug=False):
 
 # ---------------- Parse SetMap ----------------
 def _tokenize_args(s):
+    # สแกนด้วย str.find กระโดดข้ามช่วง quote/brace ทีละก้อนแทนการเดินทีละตัวอักษร
     args = []
-    cur = []
-    i = 0
     L = len(s)
-    state = None
-    brace_depth = 0
-    
+    i = 0
+    token_start = 0
     while i < L:
         c = s[i]
-        if state is None:
-            if c in "\"'":
-                state = c
-            elif c == '{':
-                state = '{'
-                brace_depth = 1
-            elif c == ',':
-                token = ''.join(cur).strip()
-                if token:
-                    args.append(token)
-                cur = []
-                i += 1
-                continue
-            cur.append(c)
-        elif state in ("'", '"'):
-            cur.append(c)
-            if c == state and (i == 0 or s[i-1] != '\\'):
-                state = None
+        if c == ',':
+            token = s[token_start:i].strip()
+            if token:
+                args.append(token)
+            i += 1
+            token_start = i
+        elif c in "\"'":
+            # หา quote ปิด โดยข้าม quote ที่ escape ด้วย backslash
+            j = s.find(c, i + 1)
+            while j != -1 and s[j - 1] == '\\':
+                j = s.find(c, j + 1)
+            i = L if j == -1 else j + 1
+        elif c == '{':
+            depth = 1
+            j = i + 1
+            while depth and j < L:
+                next_open = s.find('{', j)
+                next_close = s.find('}', j)
+                if next_close == -1:
+                    j = L
+                    break
+                if next_open != -1 and next_open < next_close:
+                    depth += 1
+                    j = next_open + 1
+                else:
+                    depth -= 1
+                    j = next_close + 1
+            i = j
         else:
-            cur.append(c)
-            if c == '{':
-                brace_depth += 1
-            elif c == '}':
-                brace_depth -= 1
-            if brace_depth == 0:
-                state = None
-        i += 1
-    
-    token = ''.join(cur).strip()
+            # กระโดดไปยังตัวอักษรพิเศษตัวถัดไปในครั้งเดียว
+            candidates = [p for p in (s.find(',', i), s.find("'", i),
+                                      s.find('"', i), s.find('{', i)) if p != -1]
+            i = min(candidates) if candidates else L
+
+    token = s[token_start:].strip()
     if token:
         args.append(token)
     return args
@@ -142,7 +179,7 @@ def _parse_options(tok):
         return tok
     body = tok[1:-1].strip()
     d = {}
-    for part in re.split(r',(?=(?:[^:]*:[^:]*$)|(?:[^,]*$))', body):
+    for part in _split_opts(body):
         if ':' not in part:
             continue
         k, v = part.split(':', 1)
@@ -153,139 +190,113 @@ def _parse_info_html(info_html):
     if not info_html:
         return {}
     
-    s = _html.unescape(info_html)
-    s = re.sub(r'<br\s*/?>', '\n', s, flags=re.I)
-    s = re.sub(r'<[^>]+>', '', s)
-    lines = [ln.strip() for ln in s.splitlines() if ln.strip()]
-    
-    def find(k):
-        for ln in lines:
-            m = re.search(rf'{k}\s*[:]\s*(.+)', ln, flags=re.I)
-            if m:
-                return m.group(1).strip()
-        return None
-    
-    out = {
-        "code": find("Code"),
-        "rain": find("Rain"),
-        "date": find("Date")
-    }
-    
+    pairs = {}
+    for m in _RE_KV.finditer(_html.unescape(info_html)):
+        key = m.group(1).strip().lower()
+        if key.startswith('solar'):
+            key = 'solar'
+        elif key == 'temp':
+            key = 'temperature'
+        pairs.setdefault(key, m.group(2).strip())
+
     def fnum(v):
         if not v:
             return None
-        m = re.search(r'([+-]?\d+(\.\d+)?)', v)
+        m = _RE_NUM.search(v)
         return float(m.group(1)) if m else None
-    
-    out["temperature_c"] = fnum(find("Temperature") or find("Temp"))
-    out["humidity_pct"] = fnum(find("Humidity"))
-    out["battery_v"] = fnum(find("Battery"))
-    out["solar_volt_v"] = fnum(find("Solar Panels Voltages") or find("Solar"))
-    out["status_text"] = find("Status")
-    
-    return out
 
-def parse_status_from_icon(icon_data):
-    if not icon_data:
-        return "UNKNOWN"
-    icon_str = str(icon_data).lower()
+    return {
+        "code": pairs.get("code"),
+        "rain": pairs.get("rain"),
+        "date": pairs.get("date"),
+        "temperature_c": fnum(pairs.get("temperature")),
+        "humidity_pct": fnum(pairs.get("humidity")),
+        "battery_v": fnum(pairs.get("battery")),
+        "solar_volt_v": fnum(pairs.get("solar")),
+        "status_text": pairs.get("status"),
+    }
 
+@lru_cache(maxsize=64)
+def _icon_status(icon_str):
     # ไอคอนระดับฝน ไม่ใช่สถานะ
-    if re.search(r'raingauge[_-]\d+(\.png)?', icon_str):
+    if _RE_RAINGAUGE.search(icon_str):
         return "UNKNOWN"
 
     # ห้ามอนุมานจากสีสำหรับไอคอนชุดนี้อีกต่อไป
     # ที่เหลือคง mapping จากชื่อไฟล์สถานะจริงเท่านั้น
-    if "online" in icon_str or "green" in icon_str or "_1" in icon_str:
-        return "ONLINE"
-    if "offline" in icon_str or "red" in icon_str or "_0" in icon_str:
-        return "OFFLINE"
-    if "timeout" in icon_str or "yellow" in icon_str or "orange" in icon_str:
-        return "TIMEOUT"
-    if "disconnect" in icon_str or "grey" in icon_str or "gray" in icon_str:
-        return "DISCONNECT"
-    if "repair" in icon_str or "maintenance" in icon_str:
-        return "REPAIR"
-    return "UNKNOWN"
+    m = _RE_STATUS.search(icon_str)
+    return m.lastgroup if m else "UNKNOWN"
+
+def parse_status_from_icon(icon_data):
+    # ไอคอนมีไม่กี่แบบ แต่สถานีมีเป็นร้อย — memoize ต่อชื่อไฟล์
+    if not icon_data:
+        return "UNKNOWN"
+    return _icon_status(str(icon_data).lower())
+
+def _collect_status_row(row_html, status_dict):
+    """เก็บสถานะจาก markup ของ <tr> หนึ่งแถว (ข้ามแถวที่ไม่มีรหัสสถานี G####)"""
+    m_code = _RE_ROW_G.search(row_html)
+    if not m_code:
+        return
+    station_code = m_code.group(1)
+
+    status_src = None
+    status_alt = None
+    m_img = _RE_ROW_IMG.search(row_html)
+    if m_img:
+        status_src = m_img.group(1)
+        status_alt = m_img.group(2) or ""
+
+    status = parse_status_from_image(status_src, status_alt)
+
+    cells = _RE_CELL.findall(row_html)
+    status_dict[station_code] = {
+        "status": status,
+        "status_src": status_src,
+        "status_alt": status_alt,
+        "row_data": [_html.unescape(_RE_TAG.sub('', c)).strip() for c in cells[:10]]
+    }
 
 def fetch_all_stations_status(session, debug=False):
     """ดึงสถานะทั้งหมดจาก Raingauge_All_Lastest.aspx"""
     try:
         if debug:
             print(f"[DEBUG] Fetching all stations status from {ALL_LATEST_URL}")
-        
-        response = session.get(ALL_LATEST_URL, timeout=60)
-        response.raise_for_status()
-        
-        if debug:
+
+        status_dict = {}
+        # สแกนแถวที่สมบูรณ์ด้วย regex ระดับ C ระหว่างที่ body ยังทยอยมาจาก network
+        buf = ""
+        debug_chunks = [] if debug else None
+
+        with session.get(ALL_LATEST_URL, stream=True, timeout=60) as response:
+            response.raise_for_status()
+            for chunk in response.iter_content(chunk_size=8192, decode_unicode=True):
+                if not chunk:
+                    continue
+                if debug_chunks is not None:
+                    debug_chunks.append(chunk)
+                buf += chunk
+                last_end = 0
+                for m in _RE_ROW.finditer(buf):
+                    _collect_status_row(m.group(1), status_dict)
+                    last_end = m.end()
+                if last_end:
+                    buf = buf[last_end:]
+                else:
+                    # ยังไม่มีแถวสมบูรณ์ ตัดหน้า buffer ทิ้งถึงจุดเริ่ม <tr ล่าสุด
+                    keep = buf.rfind('<tr')
+                    buf = buf[keep:] if keep > 0 else buf[-16:] if keep < 0 else buf
+
+        if debug_chunks is not None:
             with open("debug_all_latest.html", "w", encoding="utf-8") as f:
-                f.write(response.text)
+                f.write("".join(debug_chunks))
             print("[DEBUG] ✓ Saved HTML to debug_all_latest.html")
-        
-        soup = BeautifulSoup(response.text, "html.parser")
-        status_dict = {}
-        
-        panel_body = soup.find("div", class_="panel-body")
-        if not panel_body:
-            if debug:
-                print("[DEBUG] panel-body not found")
-            return status_dict
-        
-        table = panel_body.find("table")
-        if not table:
-            if debug:
-                print("[DEBUG] table not found in panel-body")
-            return status_dict
-        
-        rows = table.find_all("tr")
-        if debug:
-            print(f"[DEBUG] Found {len(rows)} rows in table")
-        
-        for row_idx, row in enumerate(rows):
-            if row_idx == 0:
-                continue
-            
-            cells = row.find_all("td")
-            if len(cells) < 2:
-                continue
-            
-            station_code = None
-            for cell in cells[:3]:
-                text = cell.get_text(strip=True)
-                if re.match(r'^G\d+$', text):
-                    station_code = text
-                    break
-            
-            if not station_code:
-                continue
-            
-            status_img = row.find("img", id=re.compile(r'.*Img_Status.*'))
-            status_src = None
-            status_alt = None
-            
-            if status_img:
-                status_src = status_img.get("src", "")
-                status_alt = status_img.get("alt", "")
-            
-            status = parse_status_from_image(status_src, status_alt)
-            
-            status_info = {
-                "status": status,
-                "status_src": status_src,
-                "status_alt": status_alt,
-                "row_data": [cell.get_text(strip=True) for cell in cells[:10]]
-            }
-            
-            status_dict[station_code] = status_info
-            
-            if debug and row_idx <= 3:
-                print(f"[DEBUG] {station_code}: status={status} src={status_src}")
-        
+
         if debug:
             print(f"[DEBUG] ✓ Parsed {len(status_dict)} stations status")
-        
+
         return status_dict
-        
+
     except Exception as e:
         if debug:
             print(f"[DEBUG] Error fetching all stations status: {e}")
@@ -293,32 +304,28 @@ def fetch_all_stations_status(session, debug=False):
             traceback.print_exc()
         return {}
 
-def parse_status_from_image(src, alt):
-    """Parse สถานะจาก image src หรือ alt text"""
-    if not src and not alt:
-        return "UNKNOWN"
-    
-    combined = f"{src} {alt}".lower()
-    
-    if "online" in combined or "green" in combined or "normal" in combined:
-        return "ONLINE"
-    elif "offline" in combined or "red" in combined:
-        return "OFFLINE"
-    elif "timeout" in combined or "yellow" in combined or "warning" in combined:
-        return "TIMEOUT"
-    elif "disconnect" in combined or "grey" in combined or "gray" in combined:
-        return "DISCONNECT"
-    elif "repair" in combined or "maintenance" in combined:
-        return "REPAIR"
-    
-    match = re.search(r'status[_-](\w+)', combined, re.I)
+@lru_cache(maxsize=64)
+def _classify_status(src_s, alt_s):
+    # regex เป็น case-insensitive อยู่แล้ว ค้น src ก่อนแล้วค่อย alt
+    # โดยไม่ต้อง allocate string รวม + lower ทุกแถว
+    m = _RE_STATUS.search(src_s) or _RE_STATUS.search(alt_s)
+    if m:
+        return m.lastgroup
+
+    match = _RE_STATUS_TOK.search(src_s) or _RE_STATUS_TOK.search(alt_s)
     if match:
         status_text = match.group(1).upper()
         if status_text in ["ONLINE", "OFFLINE", "TIMEOUT", "DISCONNECT", "REPAIR"]:
             return status_text
-    
+
     return "UNKNOWN"
 
+def parse_status_from_image(src, alt):
+    """Parse สถานะจาก image src หรือ alt text"""
+    if not src and not alt:
+        return "UNKNOWN"
+    return _classify_status(src or "", alt or "")
+
 def fetch_station_status_api(session, station_id, debug=False):
     """เรียก API Summary Station เพื่อดึงข้อมูลรายละเอียด"""
     if not station_id:
@@ -350,7 +357,7 @@ def fetch_station_status_api(session, station_id, debug=False):
         except:
             pass
         
-        soup = BeautifulSoup(content, "html.parser")
+        soup = BeautifulSoup(content, "lxml")
         
         status_patterns = {
             'online': r'online|connected|normal|active',
@@ -425,16 +432,12 @@ def determine_final_status(station, all_status_dict=None):
         if status_info and status_info.get("status") != "UNKNOWN":
             return status_info["status"]
     
-    if station.get("status_text"):
-        status_upper = station["status_text"].upper()
-        if any(kw in status_upper for kw in ["ONLINE", "NORMAL", "ACTIVE"]):
-            return "ONLINE"
-        elif "OFFLINE" in status_upper:
-            return "OFFLINE"
-        elif "TIMEOUT" in status_upper:
-            return "TIMEOUT"
-        elif "DISCONNECT" in status_upper:
-            return "DISCONNECT"
+    status_text = station.get("status_text")
+    if status_text:
+        for token in status_text.upper().split():
+            mapped = _TEXT_STATUS.get(token)
+            if mapped:
+                return mapped
     
     icon_status = station.get("status_from_icon")
     if icon_status and icon_status != "UNKNOWN":
@@ -446,17 +449,24 @@ def parse_setmap_from_html(html, all_status_dict=None, debug=False):
     stations = []
     count = 0
     
-    for m in re.finditer(r'SetMap\s*\(', html):
+    for m in _RE_SETMAP.finditer(html):
         i = m.end()
-        depth = 1
         start = i
-        while i < len(html) and depth:
-            if html[i] == '(':
+        depth = 1
+        # กระโดดหา ( / ) ตัวถัดไปด้วย str.find แทนการเดินทีละตัวอักษร
+        while depth:
+            next_open = html.find('(', i)
+            next_close = html.find(')', i)
+            if next_close == -1:
+                i = len(html)
+                break
+            if next_open != -1 and next_open < next_close:
                 depth += 1
-            elif html[i] == ')':
+                i = next_open + 1
+            else:
                 depth -= 1
-            i += 1
-        
+                i = next_close + 1
+
         inner = html[start:i-1].strip()
         if not inner:
             continue
@@ -505,9 +515,20 @@ def parse_setmap_from_html(html, all_status_dict=None, debug=False):
     
     return stations
 
+@lru_cache(maxsize=4096)
 def _parse_date(s):
     if not s:
         return None
+    # เส้นทางเร็ว: slice ตำแหน่งคงที่ของ "dd/mm/YYYY HH:MM [UTC]" แทน strptime
+    try:
+        if s[2] == '/' and s[5] == '/' and s[13] == ':' and s[16:].strip() in ("", "UTC"):
+            dt = datetime(int(s[6:10]), int(s[3:5]), int(s[0:2]),
+                          int(s[11:13]), int(s[14:16]))
+            if "UTC" not in s:
+                dt = dt.replace(tzinfo=timezone.utc)
+            return dt
+    except (ValueError, IndexError, TypeError):
+        pass
     for fmt in ("%d/%m/%Y %H:%M UTC", "%d/%m/%Y %H:%M"):
         try:
             dt = datetime.strptime(s, fmt)
@@ -519,6 +540,7 @@ def _parse_date(s):
     return None
 
 def clean_data(records):
+    # max-by-date reduce รอบเดียว: เก็บ (dt, rec) คู่กันเพื่อไม่ต้อง parse วันที่ซ้ำ
     out = {}
     for r in records:
         code = (r.get("code") or r.get("station_code") or "").strip()
@@ -531,18 +553,27 @@ def clean_data(records):
             "rain_mm": _to_mm(r.get("rain")),
             "date_iso": dt.isoformat() if dt else None
         }
-        existing_dt = _parse_date(out[code].get("date")) if code in out else None
-        if code not in out or (dt and existing_dt and existing_dt < dt):
-            out[code] = rec
-    return list(out.values())
+        existing = out.get(code)
+        if existing is None or (dt and (existing[0] is None or existing[0] < dt)):
+            out[code] = (dt, rec)
+    return [v[1] for v in out.values()]
 
 def _to_mm(v):
     if not v or not isinstance(v, str):
         return None
-    m = re.search(r'(-?\d+(\.\d+)?)', v)
-    return float(m.group(1)) if m else None
+    # ค่าปกติหน้าตาแบบ "12.3 mm" — float ตรงๆ ถูกกว่า regex มาก
+    try:
+        return float(v.strip().split(" ", 1)[0])
+    except ValueError:
+        m = _RE_NUM.search(v)
+        return float(m.group(1)) if m else None
 
 def save_json(data, path):
+    if orjson is not None:
+        # orjson serialize เร็วกว่าและจัดการ datetime ให้เอง (คืนค่าเป็น bytes)
+        with open(path, "wb") as f:
+            f.write(orjson.dumps(data, default=str, option=orjson.OPT_INDENT_2))
+        return
     with open(path, "w", encoding="utf-8") as f:
         json.dump(data, f, ensure_ascii=False, indent=2, default=str)
 
@@ -552,10 +583,10 @@ def save_csv(data, path):
     keys = ["station_code", "name", "lat", "lon", "status", "rain", "rain_mm", "date", "date_iso",
             "temperature_c", "humidity_pct", "battery_v", "solar_volt_v", "icon_filename", "image_path"]
     with open(path, "w", newline="", encoding="utf-8") as f:
-        w = csv.DictWriter(f, keys)
-        w.writeheader()
-        for r in data:
-            w.writerow({k: r.get(k) for k in keys})
+        # csv.writer + list rows ถูกกว่า DictWriter ที่ rebuild dict ทุกแถว
+        w = csv.writer(f)
+        w.writerow(keys)
+        w.writerows([r.get(k) for k in keys] for r in data)
 
 def main(debug=True, test_api=False):
     try:
@@ -564,7 +595,7 @@ def main(debug=True, test_api=False):
         print("=" * 60)
         
         sess = login("User", "User@1234", debug=debug)
-        
+
         if debug:
             print("\n[DEBUG] Step 1: Fetching all stations status...")
         all_status_dict = fetch_all_stations_status(sess, debug=debug)
@@ -585,22 +616,32 @@ def main(debug=True, test_api=False):
         raw = parse_setmap_from_html(html, all_status_dict, debug=debug)
         
         if test_api and raw:
-            print("\n[DEBUG] Step 4: Testing Summary Station API on 3 stations...")
-            for st in raw[:3]:
+            print(f"\n[DEBUG] Step 4: Testing Summary Station API on {len(raw)} stations...")
+
+            # ยิง API พร้อมกันหลายสถานี (network-bound) แล้วค่อยพิมพ์ผลตามลำดับเดิม
+            def _probe(st):
                 station_id = st.get("code")
-                if station_id:
-                    api_result = fetch_station_status_api(sess, station_id, debug=True)
-                    if api_result:
-                        st["status_from_api"] = api_result.get("status")
-                        st["api_response"] = api_result
-                        
-                        all_latest_status = all_status_dict.get(station_id, {}).get("status", "N/A")
-                        print(f"  {station_id}:")
-                        print(f"    All_Latest={all_latest_status} | Icon={st.get('status_from_icon')} | API={api_result.get('status')} | Final={st.get('status')}")
-                    else:
-                        print(f"  {station_id}: API returned None")
-                else:
+                if not station_id:
+                    return st, None
+                return st, fetch_station_status_api(sess, station_id)
+
+            with ThreadPoolExecutor(max_workers=8) as ex:
+                results = list(ex.map(_probe, raw))
+
+            for st, api_result in results:
+                station_id = st.get("code")
+                if not station_id:
                     print("  No station code found!")
+                    continue
+                if api_result:
+                    st["status_from_api"] = api_result.get("status")
+                    st["api_response"] = api_result
+
+                    all_latest_status = all_status_dict.get(station_id, {}).get("status", "N/A")
+                    print(f"  {station_id}:")
+                    print(f"    All_Latest={all_latest_status} | Icon={st.get('status_from_icon')} | API={api_result.get('status')} | Final={st.get('status')}")
+                else:
+                    print(f"  {station_id}: API returned None")
         
         if debug:
             print(f"\n[DEBUG] Step 5: Cleaning and saving data...")
@@ -1,14 +1,192 @@
 # maintenance_dashboard.py - ระบบติดตามการบำรุงรักษาสถานีวัดน้ำฝน
+import heapq
 import json
+import mmap
+import sys
 from datetime import datetime, timezone, timedelta
-from collections import defaultdict
+from collections import defaultdict, namedtuple
+from dataclasses import dataclass
+from functools import lru_cache
+from operator import attrgetter
+
+import numpy as np
+
+try:
+    import orjson  # เร็วกว่า json มากสำหรับโครงสร้าง dict เยอะ ๆ
+except ImportError:
+    orjson = None
+
+try:
+    from numba import njit
+except ImportError:  # numba เป็น optional - ไม่มีก็ใช้ NumPy ล้วน
+    njit = None
+
+# รหัสสถานะแบบ int8 สำหรับ kernel (0 = สถานะอื่น ๆ ที่ไม่คิดคะแนน)
+_STATUS_CODES = {'DISCONNECT': 1, 'TIMEOUT': 2, 'OFFLINE': 3}
+
+# ข้อความปัญหาตามสถานะ - hash lookup เดียวแทน if/elif สามชั้น
+# (คะแนน 200/150/180 อยู่ใน kernel _score_stations แล้ว)
+_STATUS_ISSUE = {
+    'DISCONNECT': '🔴 ขาดการติดต่อ',
+    'TIMEOUT': '🟡 หมดเวลา',
+    'OFFLINE': '🔴 ออฟไลน์',
+}
+
+# template ข้อความปัญหาแบบ bound .format - prefix คงที่ไม่ต้องประกอบใหม่ทุกครั้ง
+_FMT_BATT_CRIT = '🔴 แบตวิกฤต {}V'.format
+_FMT_BATT_WARN = '🟡 แบตต่ำ {}V'.format
+_FMT_SOLAR_CRIT = '🔴 โซล่าวิกฤต {}V'.format
+_FMT_SOLAR_WARN = '🟡 โซล่าต่ำ {}V'.format
+_FMT_TEMP_BAD = '⚠️ อุณหภูมิผิดปกติ {}°C'.format
+
+# LUT คะแนน - index ด้วยระดับ band (0=ปกติ 1=เตือน 2=วิกฤต) หรือรหัสสถานะ
+_BATT_SCORE_LUT = np.array([0, 50, 100], dtype=np.int64)
+_SOLAR_SCORE_LUT = np.array([0, 40, 80], dtype=np.int64)
+_STATUS_SCORE_LUT = np.array([0, 200, 150, 180], dtype=np.int64)
+
+
+def _score_stations_numpy(batt, solar, temp, status_code,
+                          batt_crit, batt_warn, solar_crit, solar_warn):
+    """คำนวณคะแนนความเร่งด่วนทั้งชุดด้วย NumPy (fallback เมื่อไม่มี numba)
+
+    แบบ branchless ทั้งหมด: ระดับ band = (ต่ำกว่าเตือน) + (ต่ำกว่าวิกฤต)
+    ได้ 0/1/2 แล้ว gather คะแนนจาก LUT - ไม่มี branch ต่อสถานีเลย"""
+    batt_ok = ~np.isnan(batt) & (batt != 0)
+    b_idx = ((batt < batt_warn).astype(np.int8) + (batt < batt_crit)) * batt_ok
+    solar_ok = ~np.isnan(solar) & (solar != 0)
+    s_idx = ((solar < solar_warn).astype(np.int8) + (solar < solar_crit)) * solar_ok
+    temp_ok = ~np.isnan(temp) & (temp != 0)
+    t_bad = temp_ok & ((temp < 10) | (temp > 45))
+    return (_BATT_SCORE_LUT[b_idx] + _SOLAR_SCORE_LUT[s_idx]
+            + _STATUS_SCORE_LUT[status_code]
+            + t_bad * 30)
+
+
+def _score_stations_loop(batt, solar, temp, status_code,
+                         batt_crit, batt_warn, solar_crit, solar_warn):
+    """kernel แบบ loop สำหรับคอมไพล์ด้วย numba (NaN เช็คด้วย x != x)"""
+    n = batt.shape[0]
+    score = np.zeros(n, dtype=np.int64)
+    for i in range(n):
+        bv = batt[i]
+        if bv == bv and bv != 0.0:
+            # branchless: 50 × (ระดับ band 0/1/2) = 0/50/100
+            score[i] += 50 * ((bv < batt_warn) + (bv < batt_crit))
+        sv = solar[i]
+        if sv == sv and sv != 0.0:
+            # 40 × (ระดับ band 0/1/2) = 0/40/80
+            score[i] += 40 * ((sv < solar_warn) + (sv < solar_crit))
+        sc = status_code[i]
+        if sc == 1:
+            score[i] += 200
+        elif sc == 2:
+            score[i] += 150
+        elif sc == 3:
+            score[i] += 180
+        tv = temp[i]
+        if tv == tv and tv != 0.0 and (tv < 10.0 or tv > 45.0):
+            score[i] += 30
+    return score
+
+
+if njit is not None:
+    _score_stations = njit(cache=True)(_score_stations_loop)
+    # warmup - คอมไพล์ไว้ล่วงหน้าด้วย array ว่าง จะได้ไม่สะดุดตอนรันรายงานจริง
+    _empty = np.zeros(0)
+    _score_stations(_empty, _empty, _empty, np.zeros(0, dtype=np.int8),
+                    10.0, 11.5, 5.0, 10.0)
+    del _empty
+else:
+    _score_stations = _score_stations_numpy
+
+
+def _parse_date_fast(date_str):
+    """parse 'dd/mm/YYYY HH:MM[ UTC]' ด้วยการ slice ตำแหน่งตรง ๆ (เร็วกว่า strptime มาก)
+    คืน datetime (UTC) หรือ None ถ้า parse ไม่ได้"""
+    try:
+        if date_str[2] == '/' and date_str[5] == '/' and date_str[13] == ':':
+            return datetime(int(date_str[6:10]), int(date_str[3:5]), int(date_str[0:2]),
+                            int(date_str[11:13]), int(date_str[14:16]),
+                            tzinfo=timezone.utc)
+        # รูปแบบไม่ตรงตำแหน่งมาตรฐาน - กลับไปใช้ strptime
+        if 'UTC' in date_str:
+            dt = datetime.strptime(date_str, '%d/%m/%Y %H:%M UTC')
+        else:
+            dt = datetime.strptime(date_str, '%d/%m/%Y %H:%M')
+        return dt.replace(tzinfo=timezone.utc)
+    except (ValueError, IndexError, TypeError):
+        return None
+
+
+# เส้นคั่นรายงาน เตรียมไว้ครั้งเดียว
+SEP = '-' * 80
+HSEP = '=' * 80
+
+# ผลการสแกนครบทั้งสามมุมมองในรอบเดียว
+ScanResult = namedtuple('ScanResult',
+                        ['battery_health', 'timeout_stations', 'priority_list'])
+
+
+# record แบบ slots แทน dict ต่อสถานี - เล็กกว่ามากและอ่าน field เร็วกว่า hash lookup
+@dataclass(slots=True, frozen=True)
+class BatteryEntry:
+    code: str
+    name: str
+    reason: str
+    battery_v: float = None
+    solar_v: float = None
+    last_update: str = None
+
+
+@dataclass(slots=True, frozen=True)
+class TimeoutEntry:
+    code: str
+    name: str
+    last_update: str
+    hours_ago: float
+    level: str
+    battery_v: float
+    solar_v: float
+    status: str
+
+
+@dataclass(slots=True, frozen=True)
+class PriorityEntry:
+    code: str
+    name: str
+    priority_score: int
+    issues: list
+    battery_v: float
+    solar_v: float
+    status: str
+    last_update: str
+    lat: float
+    lon: float
+
+
+@lru_cache(maxsize=4096)
+def _parse_ts(date_str):
+    """unix timestamp (float) ของ date_str หรือ None - cache ได้เพราะหลายสถานี
+    รายงานเวลาเดียวกัน และรายงานหลายรอบใช้ string ชุดเดิมซ้ำ"""
+    dt = _parse_date_fast(date_str)
+    return dt.timestamp() if dt is not None else None
+
 
 class MaintenanceDashboard:
     def __init__(self, stations_json_path='stations.json'):
         """โหลดข้อมูลสถานี"""
-        with open(stations_json_path, 'r', encoding='utf-8') as f:
-            self.stations = json.load(f)
-        
+        if orjson is not None:
+            # memory-map ไฟล์ให้ orjson อ่านตรง ๆ ไม่ต้อง copy เข้า bytes ก่อน
+            with open(stations_json_path, 'rb') as f:
+                try:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                        self.stations = orjson.loads(memoryview(mm))
+                except ValueError:  # ไฟล์ว่าง mmap ไม่ได้
+                    self.stations = orjson.loads(f.read())
+        else:
+            with open(stations_json_path, 'r', encoding='utf-8') as f:
+                self.stations = json.load(f)
+
         # เกณฑ์การประเมิน
         self.thresholds = {
             'battery': {
@@ -26,225 +204,313 @@ class MaintenanceDashboard:
                 'warning': 6,      # > 6 ชม. = เตือน
             }
         }
-    
-    def analyze_battery_health(self):
-        """วิเคราะห์สุขภาพแบตเตอรี่ทั้งหมด"""
+
+        # แปลงรายการสถานีเป็น array คู่ขนาน (SoA) สำหรับคำนวณแบบ vectorized
+        self._build_arrays()
+
+        # LUT template ตามระดับ band (0=ปกติ ไม่มีข้อความ 1=เตือน 2=วิกฤต)
+        self._batt_fmts = (None, _FMT_BATT_WARN, _FMT_BATT_CRIT)
+        self._solar_fmts = (None, _FMT_SOLAR_WARN, _FMT_SOLAR_CRIT)
+
+        # cache ผลสแกน - คำนวณครั้งเดียวต่อชุดข้อมูล (ล้างด้วย invalidate())
+        self._scan_cache = None
+
+    def _build_arrays(self):
+        """สร้าง array คู่ขนานจาก self.stations (ค่าที่ไม่มีข้อมูลเป็น NaN)"""
+        n = len(self.stations)
+        self._battery = np.full(n, np.nan)
+        self._solar = np.full(n, np.nan)
+        self._temp = np.full(n, np.nan)
+        self._ts = np.full(n, np.nan)  # unix timestamp ของ date (NaN = ไม่มี/parse ไม่ได้)
+        self._codes = np.empty(n, dtype=object)
+        self._names = np.empty(n, dtype=object)
+        self._status = np.empty(n, dtype=object)
+        self._status_code = np.zeros(n, dtype=np.int8)
+        self._dates = np.empty(n, dtype=object)
+
+        for i, st in enumerate(self.stations):
+            v = st.get('battery_v')
+            if v is not None:
+                self._battery[i] = v
+            v = st.get('solar_volt_v')
+            if v is not None:
+                self._solar[i] = v
+            v = st.get('temperature_c')
+            if v is not None:
+                self._temp[i] = v
+            self._codes[i] = st['station_code']
+            self._names[i] = st['name']
+            self._status[i] = st.get('status', 'UNKNOWN')
+            self._status_code[i] = _STATUS_CODES.get(self._status[i], 0)
+            d = st.get('date')
+            self._dates[i] = d
+            if d:
+                ts = _parse_ts(d)
+                if ts is not None:
+                    self._ts[i] = ts
+
+    def invalidate(self):
+        """ล้าง cache ผลสแกน (เรียกเมื่อ self.stations ถูกแก้ไข)"""
+        self._scan_cache = None
+
+    def _scan_all(self):
+        """คำนวณทั้งสามมุมมอง (แบต/timeout/ลำดับความเร่งด่วน) ครั้งเดียวแล้ว cache
+        ให้รายงานที่เรียกครบทุกมุมมองจ่ายค่าสแกนแค่รอบเดียว"""
+        if self._scan_cache is None:
+            self._scan_cache = ScanResult(
+                self._compute_battery_health(),
+                self._compute_timeout_stations(),
+                self._compute_priority_list()
+            )
+        return self._scan_cache
+
+    def analyze_battery_health(self, detailed=False):
+        """วิเคราะห์สุขภาพแบตเตอรี่ทั้งหมด
+
+        ปกติ 'good' เป็นจำนวนสถานี (int) - รายงานใช้แค่ตัวเลข ไม่ต้องสร้าง
+        entry เป็นพัน ๆ ตัวทิ้ง ถ้าต้องการรายการเต็มใช้ detailed=True"""
+        result = self._scan_all().battery_health
+        if detailed:
+            result = dict(result)
+            result['good'] = self._good_battery_entries()
+        return result
+
+    def _good_battery_entries(self):
+        """สร้างรายการ BatteryEntry ของกลุ่มแบตปกติ (สร้างเฉพาะเมื่อถูกขอ)"""
+        batt = self._battery
+        warn_th = self.thresholds['battery']['warning']
+        good = ~(np.isnan(batt) | (batt < warn_th))
+        fmt = 'สภาพดี ({}V)'.format
+        return [BatteryEntry(
+                    code=self._codes[i],
+                    name=self._names[i],
+                    reason=fmt(self.stations[i]['battery_v']),
+                    battery_v=self.stations[i]['battery_v'],
+                    solar_v=self.stations[i].get('solar_volt_v'),
+                    last_update=self._dates[i]
+                ) for i in np.nonzero(good)[0]]
+
+    def find_timeout_stations(self):
+        """หาสถานีที่ Timeout แยกตามระดับ {'critical': [...], 'warning': [...]}
+        แต่ละรายการเรียงตามเวลาที่ล่าช้ามากสุด"""
+        critical, warning = self._scan_all().timeout_stations
+        key = attrgetter('hours_ago')
+        return {'critical': sorted(critical, key=key, reverse=True),
+                'warning': sorted(warning, key=key, reverse=True)}
+
+    def find_timeout_stations_flat(self):
+        """รายการ Timeout รวมทุกระดับ เรียงตาม hours_ago แบบ API เดิม -
+        critical ทุกตัวล่าช้ากว่า warning เสมอ จึงต่อสองรายการได้โดยไม่ sort ซ้ำ"""
+        t = self.find_timeout_stations()
+        return t['critical'] + t['warning']
+
+    def maintenance_priority_list(self):
+        """สร้างรายการสถานีที่ต้องบำรุงรักษา เรียงตามความเร่งด่วน"""
+        return sorted(self._scan_all().priority_list,
+                      key=attrgetter('priority_score'), reverse=True)
+
+    def top_priority(self, k=10):
+        """top-K สถานีเร่งด่วนที่สุด - ใช้ heap O(N log K) แทนการ sort ทั้งรายการ"""
+        return heapq.nlargest(k, self._scan_all().priority_list,
+                              key=attrgetter('priority_score'))
+
+    def _compute_battery_health(self):
         battery_status = {
             'critical': [],  # ต้องเปลี่ยนด่วน
             'warning': [],   # ควรติดตาม
-            'good': [],      # สภาพดี
+            'good': 0,       # สภาพดี - เก็บแค่จำนวน (ดู analyze_battery_health)
             'no_data': []    # ไม่มีข้อมูล
         }
-        
-        for station in self.stations:
-            code = station['station_code']
-            name = station['name']
-            battery_v = station.get('battery_v')
-            solar_v = station.get('solar_volt_v')
-            
-            if battery_v is None:
-                battery_status['no_data'].append({
-                    'code': code,
-                    'name': name,
-                    'reason': 'ไม่มีข้อมูลแบตเตอรี่'
-                })
-                continue
-            
-            # ประเมินสถานะ
-            if battery_v < self.thresholds['battery']['critical']:
-                level = 'critical'
-                reason = f'แบตต่ำวิกฤต ({battery_v}V < {self.thresholds["battery"]["critical"]}V)'
-            elif battery_v < self.thresholds['battery']['warning']:
-                level = 'warning'
-                reason = f'แบตต่ำ ({battery_v}V < {self.thresholds["battery"]["warning"]}V)'
-            else:
-                level = 'good'
-                reason = f'สภาพดี ({battery_v}V)'
-            
-            battery_status[level].append({
-                'code': code,
-                'name': name,
-                'battery_v': battery_v,
-                'solar_v': solar_v,
-                'reason': reason,
-                'last_update': station.get('date')
-            })
-        
+
+        batt = self._battery
+        b_th = self.thresholds['battery']
+        crit_th, warn_th = b_th['critical'], b_th['warning']
+
+        # แยกระดับด้วย boolean mask ครั้งเดียว (NaN เทียบแล้วได้ False เสมอ)
+        no_data = np.isnan(batt)
+        # ระดับ band แบบ branchless: 0=ปกติ 1=เตือน 2=วิกฤต (NaN ได้ 0 แยกด้วย no_data)
+        idx = (batt < warn_th).astype(np.int8) + (batt < crit_th)
+        critical = idx == 2
+        warning = idx == 1
+        battery_status['good'] = int(len(batt) - np.count_nonzero(no_data)
+                                     - np.count_nonzero(idx))
+
+        for i in np.nonzero(no_data)[0]:
+            battery_status['no_data'].append(BatteryEntry(
+                code=self._codes[i],
+                name=self._names[i],
+                reason='ไม่มีข้อมูลแบตเตอรี่'
+            ))
+
+        # template ข้อความต่อระดับ เตรียมครั้งเดียว ไม่ต้อง if/elif ต่อสถานี
+        reason_fmt = {
+            'critical': f'แบตต่ำวิกฤต ({{}}V < {crit_th}V)'.format,
+            'warning': f'แบตต่ำ ({{}}V < {warn_th}V)'.format,
+        }
+
+        for level, mask in (('critical', critical), ('warning', warning)):
+            fmt = reason_fmt[level]
+            bucket = battery_status[level]
+            for i in np.nonzero(mask)[0]:
+                station = self.stations[i]
+                battery_v = station['battery_v']
+                bucket.append(BatteryEntry(
+                    code=self._codes[i],
+                    name=self._names[i],
+                    reason=fmt(battery_v),
+                    battery_v=battery_v,
+                    solar_v=station.get('solar_volt_v'),
+                    last_update=self._dates[i]
+                ))
+
         return battery_status
     
-    def find_timeout_stations(self):
-        """หาสถานีที่ Timeout พร้อมระยะเวลา"""
-        now = datetime.now(timezone.utc)
-        timeout_stations = []
-        
-        for station in self.stations:
-            date_str = station.get('date')
-            if not date_str:
-                continue
-            
-            # Parse วันที่
-            try:
-                if 'UTC' in date_str:
-                    dt = datetime.strptime(date_str, '%d/%m/%Y %H:%M UTC')
-                else:
-                    dt = datetime.strptime(date_str, '%d/%m/%Y %H:%M')
-                dt = dt.replace(tzinfo=timezone.utc)
-            except:
-                continue
-            
-            # คำนวณเวลาที่ล่าช้า
-            delay = now - dt
-            hours = delay.total_seconds() / 3600
-            
-            # กรองเฉพาะที่ล่าช้า
-            if hours > 1:  # ล่าช้ามากกว่า 1 ชั่วโมง
-                level = 'critical' if hours > self.thresholds['timeout']['critical'] else 'warning'
-                
-                timeout_stations.append({
-                    'code': station['station_code'],
-                    'name': station['name'],
-                    'last_update': date_str,
-                    'hours_ago': round(hours, 1),
-                    'level': level,
-                    'battery_v': station.get('battery_v'),
-                    'solar_v': station.get('solar_volt_v'),
-                    'status': station.get('status')
-                })
-        
-        # เรียงตามเวลาที่ล่าช้ามากสุด
-        timeout_stations.sort(key=lambda x: x['hours_ago'], reverse=True)
-        return timeout_stations
+    def _compute_timeout_stations(self):
+        now_ts = datetime.now(timezone.utc).timestamp()
+        crit_hours = self.thresholds['timeout']['critical']
+
+        # เทียบทั้งชุดบน timestamp array ที่ parse ไว้แล้วตอนโหลด -
+        # สถานีที่ไม่มีวันที่เป็น NaN เทียบแล้วได้ False หลุดออกเอง
+        hours = (now_ts - self._ts) / 3600
+
+        # แบ่ง critical/warning ตั้งแต่รอบเดียว ไม่ต้องกรองซ้ำทีหลัง
+        critical, warning = [], []
+        for i in np.nonzero(hours > 1)[0]:  # ล่าช้ามากกว่า 1 ชั่วโมง
+            h = float(hours[i])
+            is_crit = h > crit_hours
+            level = 'critical' if is_crit else 'warning'
+            station = self.stations[i]
+
+            (critical if is_crit else warning).append(TimeoutEntry(
+                code=self._codes[i],
+                name=self._names[i],
+                last_update=self._dates[i],
+                hours_ago=round(h, 1),
+                level=level,
+                battery_v=station.get('battery_v'),
+                solar_v=station.get('solar_volt_v'),
+                status=station.get('status')
+            ))
+
+        # ไม่เรียงที่นี่ - find_timeout_stations จัดเรียงให้ ส่วนรายงานใช้ top-K
+        return critical, warning
     
-    def maintenance_priority_list(self):
-        """สร้างรายการสถานีที่ต้องบำรุงรักษา เรียงตามความเร่งด่วน"""
+    def _compute_priority_list(self):
+        b_th, s_th = self.thresholds['battery'], self.thresholds['solar']
+        batt_crit, batt_warn = b_th['critical'], b_th['warning']
+        solar_crit, solar_warn = s_th['critical'], s_th['warning']
+        batt_fmts, solar_fmts = self._batt_fmts, self._solar_fmts
+
+        # คะแนนความเร่งด่วน (สูง = เร่งด่วนมาก) คำนวณทั้งชุดด้วย kernel
+        score = _score_stations(self._battery, self._solar, self._temp,
+                                self._status_code,
+                                batt_crit, batt_warn, solar_crit, solar_warn)
+
+        # เก็บเฉพาะสถานีที่มีปัญหา (ยังไม่เรียง - ให้ผู้เรียกเลือก sort เต็ม
+        # หรือ top-K ตามที่ต้องใช้จริง)
         priority_list = []
-        
-        for station in self.stations:
-            code = station['station_code']
-            name = station['name']
-            score = 0  # คะแนนความเร่งด่วน (สูง = เร่งด่วนมาก)
-            issues = []
-            
-            # 1. เช็คแบตเตอรี่
+        for i in np.nonzero(score > 0)[0]:
+            station = self.stations[i]
             battery_v = station.get('battery_v')
-            if battery_v:
-                if battery_v < self.thresholds['battery']['critical']:
-                    score += 100
-                    issues.append(f'🔴 แบตวิกฤต {battery_v}V')
-                elif battery_v < self.thresholds['battery']['warning']:
-                    score += 50
-                    issues.append(f'🟡 แบตต่ำ {battery_v}V')
-            
-            # 2. เช็คโซล่าเซลล์
             solar_v = station.get('solar_volt_v')
+            status = self._status[i]
+            issues = []
+            if battery_v:
+                b = (battery_v < batt_warn) + (battery_v < batt_crit)
+                if b:
+                    issues.append(batt_fmts[b](battery_v))
             if solar_v:
-                if solar_v < self.thresholds['solar']['critical']:
-                    score += 80
-                    issues.append(f'🔴 โซล่าวิกฤต {solar_v}V')
-                elif solar_v < self.thresholds['solar']['warning']:
-                    score += 40
-                    issues.append(f'🟡 โซล่าต่ำ {solar_v}V')
-            
-            # 3. เช็คสถานะ
-            status = station.get('status', 'UNKNOWN')
-            if status == 'DISCONNECT':
-                score += 200
-                issues.append('🔴 ขาดการติดต่อ')
-            elif status == 'TIMEOUT':
-                score += 150
-                issues.append('🟡 หมดเวลา')
-            elif status == 'OFFLINE':
-                score += 180
-                issues.append('🔴 ออฟไลน์')
-            
-            # 4. เช็คอุณหภูมิผิดปกติ
+                s = (solar_v < solar_warn) + (solar_v < solar_crit)
+                if s:
+                    issues.append(solar_fmts[s](solar_v))
+            status_issue = _STATUS_ISSUE.get(status)
+            if status_issue is not None:
+                issues.append(status_issue)
             temp = station.get('temperature_c')
-            if temp:
-                if temp < 10 or temp > 45:
-                    score += 30
-                    issues.append(f'⚠️ อุณหภูมิผิดปกติ {temp}°C')
-            
-            # เฉพาะสถานีที่มีปัญหา
-            if score > 0:
-                priority_list.append({
-                    'code': code,
-                    'name': name,
-                    'priority_score': score,
-                    'issues': issues,
-                    'battery_v': battery_v,
-                    'solar_v': solar_v,
-                    'status': status,
-                    'last_update': station.get('date'),
-                    'lat': station.get('lat'),
-                    'lon': station.get('lon')
-                })
-        
-        # เรียงตามความเร่งด่วน
-        priority_list.sort(key=lambda x: x['priority_score'], reverse=True)
+            if temp and (temp < 10 or temp > 45):
+                issues.append(_FMT_TEMP_BAD(temp))
+
+            priority_list.append(PriorityEntry(
+                code=self._codes[i],
+                name=self._names[i],
+                priority_score=int(score[i]),
+                issues=issues,
+                battery_v=battery_v,
+                solar_v=solar_v,
+                status=status,
+                last_update=self._dates[i],
+                lat=station.get('lat'),
+                lon=station.get('lon')
+            ))
+
         return priority_list
     
     def generate_maintenance_report(self):
         """สร้างรายงานสรุปสำหรับทีมบำรุงรักษา"""
-        print("=" * 80)
-        print("🔧 รายงานการบำรุงรักษาสถานีวัดน้ำฝน")
-        print("=" * 80)
-        print(f"📅 วันที่: {datetime.now().strftime('%d/%m/%Y %H:%M')}")
-        print(f"📊 จำนวนสถานีทั้งหมด: {len(self.stations)} สถานี\n")
-        
+        # สะสมบรรทัดไว้ก่อนแล้วเขียนทีเดียว - ไม่จ่ายค่า lock/flush ของ print ทุกบรรทัด
+        out = []
+        emit = out.append
+
+        emit(HSEP)
+        emit("🔧 รายงานการบำรุงรักษาสถานีวัดน้ำฝน")
+        emit(HSEP)
+        emit(f"📅 วันที่: {datetime.now().strftime('%d/%m/%Y %H:%M')}")
+        emit(f"📊 จำนวนสถานีทั้งหมด: {len(self.stations)} สถานี\n")
+
         # 1. สุขภาพแบตเตอรี่
-        print("🔋 สุขภาพแบตเตอรี่")
-        print("-" * 80)
+        emit("🔋 สุขภาพแบตเตอรี่")
+        emit(SEP)
         battery_health = self.analyze_battery_health()
-        print(f"  🔴 วิกฤต (< {self.thresholds['battery']['critical']}V): {len(battery_health['critical'])} สถานี")
-        print(f"  🟡 เตือน (< {self.thresholds['battery']['warning']}V): {len(battery_health['warning'])} สถานี")
-        print(f"  🟢 ปกติ (>= {self.thresholds['battery']['good']}V): {len(battery_health['good'])} สถานี")
-        print(f"  ⚪ ไม่มีข้อมูล: {len(battery_health['no_data'])} สถานี\n")
-        
+        emit(f"  🔴 วิกฤต (< {self.thresholds['battery']['critical']}V): {len(battery_health['critical'])} สถานี")
+        emit(f"  🟡 เตือน (< {self.thresholds['battery']['warning']}V): {len(battery_health['warning'])} สถานี")
+        emit(f"  🟢 ปกติ (>= {self.thresholds['battery']['good']}V): {battery_health['good']} สถานี")
+        emit(f"  ⚪ ไม่มีข้อมูล: {len(battery_health['no_data'])} สถานี\n")
+
         # แสดงรายละเอียดแบตวิกฤต
         if battery_health['critical']:
-            print("  🔴 รายการแบตเตอรี่วิกฤต (ต้องดำเนินการทันที):")
+            emit("  🔴 รายการแบตเตอรี่วิกฤต (ต้องดำเนินการทันที):")
             for st in battery_health['critical'][:5]:
-                print(f"     • {st['code']}: {st['name']}")
-                print(f"       ├─ แบต: {st['battery_v']}V | โซล่า: {st['solar_v']}V")
-                print(f"       └─ {st['reason']}\n")
-        
+                emit(f"     • {st.code}: {st.name}")
+                emit(f"       ├─ แบต: {st.battery_v}V | โซล่า: {st.solar_v}V")
+                emit(f"       └─ {st.reason}\n")
+
         # 2. สถานี Timeout
-        print("\n⏰ สถานีที่ขาดการติดต่อ")
-        print("-" * 80)
-        timeout_stations = self.find_timeout_stations()
-        critical_timeout = [s for s in timeout_stations if s['level'] == 'critical']
-        warning_timeout = [s for s in timeout_stations if s['level'] == 'warning']
-        
-        print(f"  🔴 วิกฤต (> {self.thresholds['timeout']['critical']} ชม.): {len(critical_timeout)} สถานี")
-        print(f"  🟡 เตือน (> {self.thresholds['timeout']['warning']} ชม.): {len(warning_timeout)} สถานี\n")
-        
+        emit("\n⏰ สถานีที่ขาดการติดต่อ")
+        emit(SEP)
+        critical_timeout, warning_timeout = self._scan_all().timeout_stations
+
+        emit(f"  🔴 วิกฤต (> {self.thresholds['timeout']['critical']} ชม.): {len(critical_timeout)} สถานี")
+        emit(f"  🟡 เตือน (> {self.thresholds['timeout']['warning']} ชม.): {len(warning_timeout)} สถานี\n")
+
         if critical_timeout:
-            print("  🔴 รายการ Timeout วิกฤต:")
-            for st in critical_timeout[:5]:
-                print(f"     • {st['code']}: {st['name']}")
-                print(f"       ├─ ล่าสุด: {st['last_update']} ({st['hours_ago']} ชม. ที่แล้ว)")
-                print(f"       ├─ แบต: {st['battery_v']}V | โซล่า: {st['solar_v']}V")
-                print(f"       └─ สถานะ: {st['status']}\n")
-        
+            emit("  🔴 รายการ Timeout วิกฤต:")
+            for st in heapq.nlargest(5, critical_timeout, key=attrgetter('hours_ago')):
+                emit(f"     • {st.code}: {st.name}")
+                emit(f"       ├─ ล่าสุด: {st.last_update} ({st.hours_ago} ชม. ที่แล้ว)")
+                emit(f"       ├─ แบต: {st.battery_v}V | โซล่า: {st.solar_v}V")
+                emit(f"       └─ สถานะ: {st.status}\n")
+
         # 3. รายการบำรุงรักษาตามลำดับความสำคัญ
-        print("\n📋 รายการบำรุงรักษาตามลำดับความเร่งด่วน")
-        print("-" * 80)
-        priority_list = self.maintenance_priority_list()
-        
+        emit("\n📋 รายการบำรุงรักษาตามลำดับความเร่งด่วน")
+        emit(SEP)
+        priority_list = self._scan_all().priority_list
+
         if not priority_list:
-            print("  ✅ ไม่มีสถานีที่ต้องบำรุงรักษาด่วน\n")
+            emit("  ✅ ไม่มีสถานีที่ต้องบำรุงรักษาด่วน\n")
         else:
-            print(f"  พบ {len(priority_list)} สถานีที่ต้องตรวจสอบ\n")
-            
-            for i, st in enumerate(priority_list[:10], 1):
-                print(f"  {i}. [{st['priority_score']} คะแนน] {st['code']}: {st['name']}")
-                print(f"     ปัญหา: {', '.join(st['issues'])}")
-                print(f"     พิกัด: ({st['lat']}, {st['lon']})")
-                print(f"     ล่าสุด: {st['last_update']}\n")
-        
-        print("=" * 80)
-        print("✨ จบรายงาน")
-        print("=" * 80)
+            emit(f"  พบ {len(priority_list)} สถานีที่ต้องตรวจสอบ\n")
+
+            for i, st in enumerate(self.top_priority(10), 1):
+                emit(f"  {i}. [{st.priority_score} คะแนน] {st.code}: {st.name}")
+                emit(f"     ปัญหา: {', '.join(st.issues)}")
+                emit(f"     พิกัด: ({st.lat}, {st.lon})")
+                emit(f"     ล่าสุด: {st.last_update}\n")
+
+        emit(HSEP)
+        emit("✨ จบรายงาน")
+        emit(HSEP)
+
+        sys.stdout.write('\n'.join(out) + '\n')
     
     def export_maintenance_route(self, output_file='maintenance_route.json'):
         """ส่งออกเส้นทางบำรุงรักษาสำหรับใช้กับ Route Planner"""
@@ -262,20 +528,24 @@ class MaintenanceDashboard:
         
         for st in priority_list:
             route_data['waypoints'].append({
-                'station_code': st['code'],
-                'name': st['name'],
-                'lat': st['lat'],
-                'lon': st['lon'],
-                'priority_score': st['priority_score'],
-                'issues': st['issues'],
-                'battery_v': st['battery_v'],
-                'solar_v': st['solar_v'],
-                'status': st['status'],
-                'last_update': st['last_update']
+                'station_code': st.code,
+                'name': st.name,
+                'lat': st.lat,
+                'lon': st.lon,
+                'priority_score': st.priority_score,
+                'issues': st.issues,
+                'battery_v': st.battery_v,
+                'solar_v': st.solar_v,
+                'status': st.status,
+                'last_update': st.last_update
             })
         
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(route_data, f, ensure_ascii=False, indent=2)
+        if orjson is not None:
+            with open(output_file, 'wb') as f:
+                f.write(orjson.dumps(route_data, option=orjson.OPT_INDENT_2))
+        else:
+            with open(output_file, 'w', encoding='utf-8') as f:
+                json.dump(route_data, f, ensure_ascii=False, indent=2)
         
         print(f"✅ ส่งออกเส้นทางบำรุงรักษาไปที่ {output_file}")
         return route_data
@@ -1,565 +1,834 @@
-import streamlit as st
-import pandas as pd
-import json
-import numpy as np
-from datetime import datetime, timedelta
-import pathlib
-import warnings
-warnings.filterwarnings('ignore')
-
-# Set page configuration prefix for session state
-PAGE_KEY_PREFIX = "battery_"
-
-# Custom CSS for better styling
-st.markdown("""
-<style>
-    .main-header {
-        font-size: 2.5rem;
-        color: #1f77b4;
-        text-align: center;
-        margin-bottom: 2rem;
-    }
-    .metric-card {
-        background-color: #f0f2f6;
-        padding: 1rem;
-        border-radius: 0.5rem;
-        border-left: 5px solid #1f77b4;
-    }
-    .warning-box {
-        background-color: #fff3cd;
-        border: 1px solid #ffeaa7;
-        border-radius: 0.5rem;
-        padding: 1rem;
-        margin: 1rem 0;
-    }
-    .success-box {
-        background-color: #d4edda;
-        border: 1px solid #c3e6cb;
-        border-radius: 0.5rem;
-        padding: 1rem;
-        margin: 1rem 0;
-    }
-</style>
-""", unsafe_allow_html=True)
-
-@st.cache_data(ttl=600)
-def load_latest():
-    """โหลดข้อมูลจาก data/latest.json"""
-    BASE_DIR = pathlib.Path(__file__).resolve().parents[1]
-    DATA_DIR = BASE_DIR / "data"
-    LATEST_PATH = DATA_DIR / "latest.json"
-    
-    try:
-        with open(LATEST_PATH, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        
-        # Extract station data
-        stations = data.get("stations", [])
-        df = pd.DataFrame(stations)
-        
-        # Normalize station ID column
-        if 'station_id' not in df.columns:
-            if 'station_code' in df.columns:
-                df['station_id'] = df['station_code']
-            elif 'code' in df.columns:
-                df['station_id'] = df['code']
-        
-        # Convert date columns
-        if 'date_iso' in df.columns:
-            df['timestamp'] = pd.to_datetime(df['date_iso'], errors='coerce')
-        elif 'date' in df.columns:
-            df['timestamp'] = pd.to_datetime(df['date'], errors='coerce')
-        
-        # Filter out stations with missing battery data
-        df = df.dropna(subset=['battery_v', 'timestamp'])
-        
-        return df
-    
-    except Exception as e:
-        st.error(f"❌ โหลดข้อมูลล้มเหลว: {e}")
-        return pd.DataFrame()
-
-def calculate_battery_metrics(df):
-    """คำนวณ metrics สำหรับ battery health"""
-    if df.empty:
-        return {}
-    
-    # Basic statistics
-    metrics = {
-        'total_stations': len(df),
-        'avg_voltage': df['battery_v'].mean(),
-        'min_voltage': df['battery_v'].min(),
-        'max_voltage': df['battery_v'].max(),
-        'std_voltage': df['battery_v'].std(),
-        'median_voltage': df['battery_v'].median(),
-        'p25_voltage': df['battery_v'].quantile(0.25),
-        'p75_voltage': df['battery_v'].quantile(0.75)
-    }
-    
-    # Count stations by voltage ranges
-    metrics['critical_low'] = len(df[df['battery_v'] < 11.0])
-    metrics['low'] = len(df[(df['battery_v'] >= 11.0) & (df['battery_v'] < 12.0)])
-    metrics['normal'] = len(df[(df['battery_v'] >= 12.0) & (df['battery_v'] <= 14.0)])
-    metrics['high'] = len(df[df['battery_v'] > 14.0])
-    
-    return metrics
-
-def calculate_voltage_decay_rate(df):
-    """คำนวณอัตราการลดลงของแรงดัน (ΔV/day)"""
-    if df.empty:
-        return pd.DataFrame()
-    
-    # Sort by station and timestamp
-    df_sorted = df.sort_values(['station_id', 'timestamp'])
-    
-    decay_rates = []
-    
-    for station_id in df_sorted['station_id'].unique():
-        station_data = df_sorted[df_sorted['station_id'] == station_id].copy()
-        
-        if len(station_data) < 2:
-            continue
-        
-        # Calculate daily decay rate
-        station_data = station_data.sort_values('timestamp')
-        station_data['prev_voltage'] = station_data['battery_v'].shift(1)
-        station_data['prev_timestamp'] = station_data['timestamp'].shift(1)
-        
-        # Calculate time difference in days
-        station_data['days_diff'] = (station_data['timestamp'] - station_data['prev_timestamp']).dt.total_seconds() / (24 * 3600)
-        
-        # Calculate voltage decay rate (V/day)
-        station_data['decay_rate'] = (station_data['prev_voltage'] - station_data['battery_v']) / station_data['days_diff']
-        
-        # Get the latest decay rate
-        latest_decay = station_data.dropna(subset=['decay_rate']).iloc[-1] if not station_data['decay_rate'].dropna().empty else None
-        
-        if latest_decay is not None:
-            decay_rates.append({
-                'station_id': station_id,
-                'station_name': station_data.iloc[-1].get('name_th', station_data.iloc[-1].get('name', 'Unknown')),
-                'decay_rate': latest_decay['decay_rate'],
-                'current_voltage': station_data.iloc[-1]['battery_v'],
-                'last_update': station_data.iloc[-1]['timestamp']
-            })
-    
-    return pd.DataFrame(decay_rates)
-
-def detect_anomalies(df, threshold_std=2.0):
-    """ตรวจจับค่าผิดปกติใน battery voltage"""
-    if df.empty:
-        return pd.DataFrame()
-    
-    anomalies = []
-    
-    for station_id in df['station_id'].unique():
-        station_data = df[df['station_id'] == station_id].copy()
-        
-        if len(station_data) < 3:
-            continue
-        
-        # Calculate rolling statistics
-        station_data = station_data.sort_values('timestamp')
-        station_data['rolling_mean'] = station_data['battery_v'].rolling(window=3, center=True).mean()
-        station_data['rolling_std'] = station_data['battery_v'].rolling(window=3, center=True).std()
-        
-        # Detect anomalies (voltage drop > threshold_std * std)
-        station_data['z_score'] = np.abs((station_data['battery_v'] - station_data['rolling_mean']) / station_data['rolling_std'])
-        
-        anomaly_points = station_data[station_data['z_score'] > threshold_std]
-        
-        for _, anomaly in anomaly_points.iterrows():
-            anomalies.append({
-                'station_id': station_id,
-                'station_name': anomaly.get('name_th', anomaly.get('name', 'Unknown')),
-                'timestamp': anomaly['timestamp'],
-                'voltage': anomaly['battery_v'],
-                'expected_voltage': anomaly['rolling_mean'],
-                'z_score': anomaly['z_score'],
-                'voltage_drop': anomaly['rolling_mean'] - anomaly['battery_v']
-            })
-    
-    return pd.DataFrame(anomalies)
-
-def create_battery_health_trend(df):
-    """สร้างกราฟแนวโน้มสุขภาพแบตเตอรี่"""
-    if df.empty:
-        return None
-    
-    # Lazy import plotly with error handling
-    try:
-        import plotly.graph_objects as go
-    except Exception as e:
-        st.error("ต้องติดตั้ง plotly เพื่อแสดงกราฟ: เพิ่ม 'plotly' ใน requirements แล้ว redeploy")
-        return None
-    
-    # Group by date and calculate statistics
-    df_daily = df.copy()
-    df_daily['date'] = df_daily['timestamp'].dt.date
-    
-    daily_stats = df_daily.groupby('date').agg({
-        'battery_v': ['median', 'mean', lambda x: x.quantile(0.25), lambda x: x.quantile(0.75)]
-    }).reset_index()
-    
-    daily_stats.columns = ['date', 'median', 'mean', 'q25', 'q75']
-    
-    # Create line chart
-    fig = go.Figure()
-    
-    # Add median line
-    fig.add_trace(go.Scatter(
-        x=daily_stats['date'],
-        y=daily_stats['median'],
-        mode='lines+markers',
-        name='Median Voltage',
-        line=dict(color='blue', width=3),
-        marker=dict(size=6)
-    ))
-    
-    # Add mean line
-    fig.add_trace(go.Scatter(
-        x=daily_stats['date'],
-        y=daily_stats['mean'],
-        mode='lines',
-        name='Mean Voltage',
-        line=dict(color='green', width=2, dash='dash')
-    ))
-    
-    # Add confidence interval (25th-75th percentile)
-    fig.add_trace(go.Scatter(
-        x=daily_stats['date'],
-        y=daily_stats['q75'],
-        mode='lines',
-        line=dict(width=0),
-        showlegend=False,
-        hoverinfo='skip'
-    ))
-    
-    fig.add_trace(go.Scatter(
-        x=daily_stats['date'],
-        y=daily_stats['q25'],
-        mode='lines',
-        line=dict(width=0),
-        fill='tonexty',
-        fillcolor='rgba(0,100,80,0.2)',
-        name='25th-75th Percentile',
-        hoverinfo='skip'
-    ))
-    
-    fig.update_layout(
-        title='Battery Health Trend - Median & Percentile Analysis',
-        xaxis_title='Date',
-        yaxis_title='Battery Voltage (V)',
-        hovermode='x unified',
-        template='plotly_white',
-        height=400
-    )
-    
-    return fig
-
-def create_decay_rate_ranking(decay_df):
-    """สร้างกราฟจัดอันดับอัตราการเสื่อมสภาพแบตเตอรี่"""
-    if decay_df.empty:
-        return None
-    
-    # Lazy import plotly with error handling
-    try:
-        import plotly.express as px
-    except Exception as e:
-        st.error("ต้องติดตั้ง plotly เพื่อแสดงกราฟ: เพิ่ม 'plotly' ใน requirements แล้ว redeploy")
-        return None
-    
-    # Get top 15 stations with highest decay rate
-    top_decay = decay_df.nlargest(15, 'decay_rate')
-    
-    # Create bar chart
-    fig = px.bar(
-        top_decay,
-        x='decay_rate',
-        y='station_id',
-        orientation='h',
-        title='Battery Decay Rate Ranking (ΔV/day)',
-        labels={'decay_rate': 'Voltage Decay Rate (V/day)', 'station_id': 'Station ID'},
-        color='decay_rate',
-        color_continuous_scale='Reds'
-    )
-    
-    fig.update_layout(
-        yaxis={'categoryorder': 'total ascending'},
-        height=500,
-        template='plotly_white'
-    )
-    
-    return fig
-
-def create_anomaly_timeline(df, anomalies_df):
-    """สร้างกราฟไทม์ไลน์พร้อมจุดผิดปกติ"""
-    if df.empty:
-        return None
-    
-    # Lazy import plotly with error handling
-    try:
-        import plotly.graph_objects as go
-    except Exception as e:
-        st.error("ต้องติดตั้ง plotly เพื่อแสดงกราฟ: เพิ่ม 'plotly' ใน requirements แล้ว redeploy")
-        return None
-    
-    fig = go.Figure()
-    
-    # Plot normal voltage timeline for each station
-    for station_id in df['station_id'].unique()[:10]:  # Limit to 10 stations for clarity
-        station_data = df[df['station_id'] == station_id].sort_values('timestamp')
-        
-        fig.add_trace(go.Scatter(
-            x=station_data['timestamp'],
-            y=station_data['battery_v'],
-            mode='lines+markers',
-            name=f'Station {station_id}',
-            line=dict(width=2),
-            marker=dict(size=4)
-        ))
-    
-    # Add anomaly points
-    if not anomalies_df.empty:
-        fig.add_trace(go.Scatter(
-            x=anomalies_df['timestamp'],
-            y=anomalies_df['voltage'],
-            mode='markers',
-            name='Anomalies',
-            marker=dict(
-                size=10,
-                color='red',
-                symbol='x',
-                line=dict(width=2, color='darkred')
-            ),
-            text=anomalies_df.apply(lambda x: f"Station: {x['station_id']}<br>Voltage Drop: {x['voltage_drop']:.2f}V", axis=1),
-            hovertemplate='%{text}<extra></extra>'
-        ))
-    
-    fig.update_layout(
-        title='Battery Anomaly Timeline',
-        xaxis_title='Timestamp',
-        yaxis_title='Battery Voltage (V)',
-        hovermode='closest',
-        template='plotly_white',
-        height=400
-    )
-    
-    return fig
-
-def create_voltage_distribution(df):
-    """สร้าง boxplot การกระจายของแรงดันแบตเตอรี่"""
-    if df.empty:
-        return None
-    
-    # Lazy import plotly with error handling
-    try:
-        import plotly.graph_objects as go
-    except Exception as e:
-        st.error("ต้องติดตั้ง plotly เพื่อแสดงกราฟ: เพิ่ม 'plotly' ใน requirements แล้ว redeploy")
-        return None
-    
-    # Create boxplot
-    fig = go.Figure()
-    
-    fig.add_trace(go.Box(
-        y=df['battery_v'],
-        name='All Stations',
-        boxpoints='outliers',
-        jitter=0.3,
-        pointpos=-1.8,
-        marker_color='lightblue',
-        line_color='darkblue'
-    ))
-    
-    fig.update_layout(
-        title='Battery Voltage Distribution Across All Stations',
-        yaxis_title='Battery Voltage (V)',
-        template='plotly_white',
-        height=400
-    )
-    
-    return fig
-
-def main():
-    """ฟังก์ชันหลักของ Dashboard"""
-    st.title("🔋 Battery Health Dashboard")
-    st.caption("พลังงานและสุขภาพของแบตเตอรี่สถานีวัดระดับน้ำฝน")
-    
-    # Load data
-    with st.spinner("กำลังโหลดข้อมูลสถานี..."):
-        df = load_latest()
-    
-    if df.empty:
-        st.error("❌ ไม่สามารถโหลดข้อมูลสถานีได้")
-        st.stop()
-    
-    # Sidebar filters
-    st.sidebar.header("🔧 ตัวกรองข้อมูล")
-    
-    # Date range filter
-    if 'timestamp' in df.columns:
-        min_date = df['timestamp'].min().date()
-        max_date = df['timestamp'].max().date()
-        
-        selected_date_range = st.sidebar.date_input(
-            "เลือกช่วงวันที่",
-            value=[min_date, max_date],
-            min_value=min_date,
-            max_value=max_date
-        )
-        
-        if len(selected_date_range) == 2:
-            start_date, end_date = selected_date_range
-            df = df[(df['timestamp'].dt.date >= start_date) & (df['timestamp'].dt.date <= end_date)]
-    
-    # Voltage range filter
-    voltage_range = st.sidebar.slider(
-        "ช่วงแรงดันแบตเตอรี่ (V)",
-        min_value=float(df['battery_v'].min()),
-        max_value=float(df['battery_v'].max()),
-        value=(float(df['battery_v'].min()), float(df['battery_v'].max()))
-    )
-    
-    df = df[(df['battery_v'] >= voltage_range[0]) & (df['battery_v'] <= voltage_range[1])]
-    
-    # Calculate metrics
-    metrics = calculate_battery_metrics(df)
-    decay_rates = calculate_voltage_decay_rate(df)
-    anomalies = detect_anomalies(df)
-    
-    # Display key metrics
-    st.subheader("📊 ภาพรวมสุขภาพแบตเตอรี่")
-    
-    col1, col2, col3, col4 = st.columns(4)
-    
-    with col1:
-        st.metric("จำนวนสถานี", metrics.get('total_stations', 0))
-    
-    with col2:
-        avg_v = metrics.get('avg_voltage', 0)
-        st.metric("แรงดันเฉลี่ย", f"{avg_v:.2f} V")
-    
-    with col3:
-        critical = metrics.get('critical_low', 0)
-        st.metric("แรงดันต่ำวิกฤต", critical, delta=f"{critical} สถานี")
-    
-    with col4:
-        normal = metrics.get('normal', 0)
-        total = metrics.get('total_stations', 1)
-        health_pct = (normal / total) * 100
-        st.metric("สถานีปกติ", f"{health_pct:.1f}%")
-    
-    # Battery status distribution
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        # Create pie chart for voltage status
-        status_data = {
-            'วิกฤตต่ำ (<11V)': metrics.get('critical_low', 0),
-            'ต่ำ (11-12V)': metrics.get('low', 0),
-            'ปกติ (12-14V)': metrics.get('normal', 0),
-            'สูง (>14V)': metrics.get('high', 0)
-        }
-        
-        # Lazy import plotly with error handling
-        try:
-            import plotly.express as px
-        except Exception as e:
-            st.error("ต้องติดตั้ง plotly เพื่อแสดงกราฟ: เพิ่ม 'plotly' ใน requirements แล้ว redeploy")
-            return
-        
-        fig_pie = px.pie(
-            values=list(status_data.values()),
-            names=list(status_data.keys()),
-            title="สถานะแรงดันแบตเตอรี่"
-        )
-        fig_pie.update_layout(height=300)
-        st.plotly_chart(fig_pie, width="stretch")
-    
-    with col2:
-        # Display statistics
-        st.subheader("สถิติแรงดัน")
-        st.write(f"**ค่าเฉลี่ย:** {metrics.get('avg_voltage', 0):.2f} V")
-        st.write(f"**ค่ามัธยฐาน:** {metrics.get('median_voltage', 0):.2f} V")
-        st.write(f"**ช่วง 25-75%:** {metrics.get('p25_voltage', 0):.2f} - {metrics.get('p75_voltage', 0):.2f} V")
-        st.write(f"**ส่วนเบี่ยงเบนมาตรฐาน:** {metrics.get('std_voltage', 0):.2f} V")
-    
-    # Main charts
-    st.subheader("📈 กราฟวิเคราะห์สุขภาพแบตเตอรี่")
-    
-    # Battery Health Trend
-    st.write("### 1. Battery Health Trend (ค่า median/percentile ของ battery_v ตามเวลา)")
-    trend_fig = create_battery_health_trend(df)
-    if trend_fig:
-        st.plotly_chart(trend_fig, width="stretch")
-    
-    # Battery Decay Rate Ranking
-    st.write("### 2. Battery Decay Rate Ranking (แสดงสถานีที่ ΔV/day สูงสุด)")
-    decay_fig = create_decay_rate_ranking(decay_rates)
-    if decay_fig:
-        st.plotly_chart(decay_fig, width="stretch")
-    
-    # Battery Anomaly Timeline
-    st.write("### 3. Battery Anomaly Timeline (แรงดันตกเร็วผิดปกติ)")
-    anomaly_fig = create_anomaly_timeline(df, anomalies)
-    if anomaly_fig:
-        st.plotly_chart(anomaly_fig, width="stretch")
-    
-    # Voltage Distribution
-    st.write("### 4. Distribution ของ battery_v ทุกสถานี")
-    dist_fig = create_voltage_distribution(df)
-    if dist_fig:
-        st.plotly_chart(dist_fig, width="stretch")
-    
-    # Top 10 stations with fastest voltage decay
-    st.subheader("🏆 Top 10 สถานีที่แรงดันตกเร็วที่สุด")
-    
-    if not decay_rates.empty:
-        top_10_decay = decay_rates.nlargest(10, 'decay_rate')
-        
-        # Format table
-        display_df = top_10_decay.copy()
-        display_df['decay_rate'] = display_df['decay_rate'].round(3)
-        display_df['current_voltage'] = display_df['current_voltage'].round(2)
-        display_df['last_update'] = display_df['last_update'].dt.strftime('%Y-%m-%d %H:%M')
-        
-        display_df = display_df.rename(columns={
-            'station_id': 'รหัสสถานี',
-            'station_name': 'ชื่อสถานี',
-            'decay_rate': 'อัตราการลด (V/day)',
-            'current_voltage': 'แรงดันปัจจุบัน (V)',
-            'last_update': 'อัปเดตล่าสุด'
-        })
-        
-        st.dataframe(display_df, width="stretch", hide_index=True)
-        
-        # Add warning for critical stations
-        critical_stations = display_df[display_df['อัตราการลด (V/day)'] > 0.1]
-        if not critical_stations.empty:
-            st.markdown('<div class="warning-box">⚠️ <strong>คำเตือน:</strong> มีสถานีที่แรงดันตกเร็วผิดปกติ (>0.1 V/day) ควรตรวจสอบโดยเร่งด่วน!</div>', unsafe_allow_html=True)
-    else:
-        st.info("ไม่มีข้อมูลการเสื่อมสภาพของแบตเตอรี่")
-    
-    # Anomaly detection results
-    if not anomalies.empty:
-        st.subheader("🚨 ตรวจพบค่าผิดปกติ")
-        
-        # Show recent anomalies
-        recent_anomalies = anomalies.nlargest(10, 'voltage_drop')
-        
-        for _, anomaly in recent_anomalies.iterrows():
-            st.markdown(f"""
-            <div class="warning-box">
-                <strong>สถานี {anomaly['station_id']}</strong> - {anomaly['timestamp'].strftime('%Y-%m-%d %H:%M')}<br>
-                แรงดัน: {anomaly['voltage']:.2f}V (คาดว่า: {anomaly['expected_voltage']:.2f}V)<br>
-                การตกลง: {anomaly['voltage_drop']:.2f}V (Z-score: {anomaly['z_score']:.2f})
-            </div>
-            """, unsafe_allow_html=True)
-    
-    # Footer
-    st.markdown("---")
-    st.markdown('<p style="text-align: center; color: #666;">📊 Battery Health Dashboard - Real-time Monitoring System</p>', unsafe_allow_html=True)
-
-if __name__ == "__main__":
+import streamlit as st
+import pandas as pd
+import json
+import numpy as np
+from datetime import datetime, timedelta
+import pathlib
+import warnings
+warnings.filterwarnings('ignore')
+
+try:
+    import orjson  # เร็วกว่า json มากสำหรับไฟล์สถานีก้อนใหญ่
+except ImportError:
+    orjson = None
+
+try:
+    import polars as pl  # optional - กระจาย groupby หลาย thread ถ้าติดตั้งไว้
+except ImportError:
+    pl = None
+
+try:
+    from numba import njit, prange  # optional - kernel สำรองเมื่อไม่มี polars
+except ImportError:
+    njit = None
+    prange = range
+
+# Import plotly once at module load; chart functions just check the flag
+try:
+    import plotly.graph_objects as go
+    import plotly.express as px
+    _PLOTLY_OK = True
+except ImportError:
+    _PLOTLY_OK = False
+
+_PLOTLY_MISSING_MSG = "ต้องติดตั้ง plotly เพื่อแสดงกราฟ: เพิ่ม 'plotly' ใน requirements แล้ว redeploy"
+
+# Set page configuration prefix for session state
+PAGE_KEY_PREFIX = "battery_"
+
+# Custom CSS for better styling
+st.markdown("""
+<style>
+    .main-header {
+        font-size: 2.5rem;
+        color: #1f77b4;
+        text-align: center;
+        margin-bottom: 2rem;
+    }
+    .metric-card {
+        background-color: #f0f2f6;
+        padding: 1rem;
+        border-radius: 0.5rem;
+        border-left: 5px solid #1f77b4;
+    }
+    .warning-box {
+        background-color: #fff3cd;
+        border: 1px solid #ffeaa7;
+        border-radius: 0.5rem;
+        padding: 1rem;
+        margin: 1rem 0;
+    }
+    .success-box {
+        background-color: #d4edda;
+        border: 1px solid #c3e6cb;
+        border-radius: 0.5rem;
+        padding: 1rem;
+        margin: 1rem 0;
+    }
+</style>
+""", unsafe_allow_html=True)
+
+@st.cache_resource(ttl=600)
+def load_latest():
+    """โหลดข้อมูลจาก data/latest.json
+
+    ใช้ cache_resource เพื่อเลี่ยงการ pickle/copy DataFrame ทุก cache hit
+    ของ cache_data - frame ที่คืนถือเป็น read-only: ทุกจุดที่กรองข้างล่าง
+    ทำผ่าน boolean indexing ซึ่งสร้าง frame ใหม่ ไม่แก้ของเดิม in place"""
+    BASE_DIR = pathlib.Path(__file__).resolve().parents[1]
+    DATA_DIR = BASE_DIR / "data"
+    LATEST_PATH = DATA_DIR / "latest.json"
+    
+    try:
+        if orjson is not None:
+            with open(LATEST_PATH, "rb") as f:
+                data = orjson.loads(f.read())
+        else:
+            with open(LATEST_PATH, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        
+        # Extract station data
+        stations = data.get("stations", [])
+        df = pd.DataFrame(stations)
+        
+        # Normalize station ID column
+        if 'station_id' not in df.columns:
+            if 'station_code' in df.columns:
+                df['station_id'] = df['station_code']
+            elif 'code' in df.columns:
+                df['station_id'] = df['code']
+        
+        # Convert date columns - explicit ISO8601 format keeps parsing on the
+        # C fast path instead of per-element dateutil dispatch; cache=True
+        # dedupes repeated timestamp strings before parsing
+        if 'date_iso' in df.columns:
+            df['timestamp'] = pd.to_datetime(df['date_iso'], format='ISO8601',
+                                             errors='coerce', cache=True)
+        elif 'date' in df.columns:
+            df['timestamp'] = pd.to_datetime(df['date'], errors='coerce', cache=True)
+        
+        # Downcast hot columns: float32 halves the bytes every scan touches,
+        # and categorical station_id lets repeated groupby skip re-hashing strings
+        if 'battery_v' in df.columns:
+            df['battery_v'] = pd.to_numeric(df['battery_v'], errors='coerce').astype('float32')
+        if 'station_id' in df.columns:
+            df['station_id'] = df['station_id'].astype('category')
+
+        # Filter out stations with missing battery data
+        df = df.dropna(subset=['battery_v', 'timestamp'])
+
+        # Keep rows sorted by time and stash the int64 ns values: the sidebar
+        # date filter can then locate its window with two binary searches
+        # instead of materializing .dt.date for every row
+        df = df.sort_values('timestamp', kind='stable', ignore_index=True)
+        df.attrs['ts_ns'] = df['timestamp'].astype('int64').to_numpy()
+
+        # Cache column extrema once at load; the sidebar widgets read these
+        # instead of rescanning the column on every rerun
+        if len(df):
+            df.attrs['v_min'] = float(df['battery_v'].min())
+            df.attrs['v_max'] = float(df['battery_v'].max())
+            df.attrs['t_min'] = df['timestamp'].iloc[0]
+            df.attrs['t_max'] = df['timestamp'].iloc[-1]
+
+        return df
+    
+    except Exception as e:
+        st.error(f"❌ โหลดข้อมูลล้มเหลว: {e}")
+        return pd.DataFrame()
+
+def calculate_battery_metrics(df):
+    """คำนวณ metrics สำหรับ battery health"""
+    if df.empty:
+        return {}
+    
+    # Basic statistics on the raw ndarray - quantiles via np.partition
+    # (O(n) introselect) instead of a full sort; picks the element at each
+    # quartile index, which matches quantile() to within one sample
+    v = df['battery_v'].to_numpy()
+    n = len(v)
+    q_idx = np.array([n // 4, n // 2, 3 * n // 4]).clip(max=n - 1)
+    part = np.partition(v, q_idx)
+    metrics = {
+        'total_stations': n,
+        'avg_voltage': float(v.mean()),
+        'min_voltage': float(v.min()),
+        'max_voltage': float(v.max()),
+        'std_voltage': float(v.std(ddof=1)) if n > 1 else float('nan'),
+        'median_voltage': float(part[q_idx[1]]),
+        'p25_voltage': float(part[q_idx[0]]),
+        'p75_voltage': float(part[q_idx[2]])
+    }
+
+    # Count stations by voltage ranges in a single bucketization pass
+    # (side='right' + epsilon keeps the old boundary semantics:
+    #  <11 / 11-12 / 12-14 inclusive / >14)
+    counts = np.bincount(
+        np.searchsorted([11.0, 12.0, 14.0 + 1e-9], v, side='right'),
+        minlength=4
+    )
+    metrics['critical_low'] = int(counts[0])
+    metrics['low'] = int(counts[1])
+    metrics['normal'] = int(counts[2])
+    metrics['high'] = int(counts[3])
+
+    return metrics
+
+def _pick_name_col(df):
+    """เลือกคอลัมน์ชื่อสถานีที่มีอยู่จริง (name_th > name > ไม่มี)"""
+    if 'name_th' in df.columns:
+        return 'name_th'
+    if 'name' in df.columns:
+        return 'name'
+    return None
+
+
+def _decay_rate_polars(df):
+    """decay rate ผ่าน Polars lazy expressions - groupby แบบขนานบนคอลัมน์ Arrow"""
+    name_col = _pick_name_col(df)
+    cols = ['station_id', 'timestamp', 'battery_v'] + ([name_col] if name_col else [])
+
+    lf = (pl.from_pandas(df[cols]).lazy()
+          .sort(['station_id', 'timestamp'])
+          .with_columns([
+              (pl.col('battery_v').shift(1).over('station_id')
+               - pl.col('battery_v')).alias('dv'),
+              (pl.col('timestamp').diff().over('station_id')
+               .dt.total_seconds() / 86400).alias('dt_days'),
+          ])
+          .with_columns((pl.col('dv') / pl.col('dt_days')).alias('decay_rate')))
+
+    name_expr = (pl.col(name_col).last().alias('station_name') if name_col
+                 else pl.lit('Unknown').alias('station_name'))
+    agg = (lf.group_by('station_id', maintain_order=True)
+           .agg([
+               pl.col('decay_rate').drop_nulls().last().alias('decay_rate'),
+               name_expr,
+               pl.col('battery_v').last().alias('current_voltage'),
+               pl.col('timestamp').last().alias('last_update'),
+           ])
+           .drop_nulls(subset=['decay_rate'])
+           .collect())
+
+    return agg.to_pandas()[['station_id', 'station_name', 'decay_rate',
+                            'current_voltage', 'last_update']]
+
+
+def _anomalies_polars(df, threshold_std):
+    """rolling z-score ผ่าน Polars - window ต่อสถานีคำนวณขนานกันทั้งชุด"""
+    name_col = _pick_name_col(df)
+    cols = ['station_id', 'timestamp', 'battery_v'] + ([name_col] if name_col else [])
+
+    name_expr = (pl.col(name_col).alias('station_name') if name_col
+                 else pl.lit('Unknown').alias('station_name'))
+    hits = (pl.from_pandas(df[cols]).lazy()
+            .sort(['station_id', 'timestamp'])
+            .with_columns([
+                pl.col('battery_v').rolling_mean(3, center=True)
+                .over('station_id').alias('expected_voltage'),
+                pl.col('battery_v').rolling_std(3, center=True)
+                .over('station_id').alias('rolling_std'),
+            ])
+            .with_columns(((pl.col('battery_v') - pl.col('expected_voltage'))
+                           / pl.col('rolling_std')).abs().alias('z_score'))
+            .filter(pl.col('z_score') > threshold_std)
+            .with_columns([
+                name_expr,
+                pl.col('battery_v').alias('voltage'),
+                (pl.col('expected_voltage') - pl.col('battery_v')).alias('voltage_drop'),
+            ])
+            .collect())
+
+    return hits.to_pandas()[['station_id', 'station_name', 'timestamp', 'voltage',
+                             'expected_voltage', 'z_score', 'voltage_drop']]
+
+
+def _station_scan_loop(codes, v, ts_ns, decay, exp_v, z):
+    """kernel เดียวกวาดทั้ง decay rate และ rolling z-score ต่อแถว
+
+    รับ frame ที่เรียงตาม (station_id, timestamp) แล้ว - แต่ละสถานีเป็นช่วง
+    ติดกัน เทียบ codes ข้างเคียงก็รู้ขอบเขตสถานีโดยไม่ต้อง groupby"""
+    n = codes.shape[0]
+    for i in prange(n):
+        decay[i] = np.nan
+        exp_v[i] = np.nan
+        z[i] = np.nan
+        c = codes[i]
+        if i > 0 and codes[i - 1] == c:
+            dt_days = (ts_ns[i] - ts_ns[i - 1]) / 86.4e12
+            if dt_days != 0.0:
+                decay[i] = (v[i - 1] - v[i]) / dt_days
+        if 0 < i < n - 1 and codes[i - 1] == c and codes[i + 1] == c:
+            m = (v[i - 1] + v[i] + v[i + 1]) / 3.0
+            # ddof=1 ให้ตรงกับ pandas rolling(...).std()
+            var = ((v[i - 1] - m) ** 2 + (v[i] - m) ** 2 + (v[i + 1] - m) ** 2) / 2.0
+            exp_v[i] = m
+            if var > 0.0:
+                z[i] = abs(v[i] - m) / np.sqrt(var)
+
+
+if njit is not None:
+    _station_scan_kernel = njit(parallel=True, cache=True)(_station_scan_loop)
+else:
+    _station_scan_kernel = _station_scan_loop
+
+
+def _station_scan(df_sorted):
+    """รัน kernel บนคอลัมน์ดิบ (categorical codes / float32 / int64 ns)
+    คืน (decay_rate, expected_voltage, z_score) เรียงตามแถวของ df_sorted"""
+    sid = df_sorted['station_id']
+    codes = (sid.cat.codes if hasattr(sid, 'cat') else
+             sid.factorize()[0]).astype(np.int64, copy=False)
+    codes = np.ascontiguousarray(codes)
+    v = np.ascontiguousarray(df_sorted['battery_v'].to_numpy(np.float64))
+    ts_ns = np.ascontiguousarray(df_sorted['timestamp'].astype('int64').to_numpy())
+
+    n = len(df_sorted)
+    decay = np.empty(n)
+    exp_v = np.empty(n)
+    z = np.empty(n)
+    _station_scan_kernel(codes, v, ts_ns, decay, exp_v, z)
+    return decay, exp_v, z
+
+
+def calculate_voltage_decay_rate(df, df_sorted=None):
+    """คำนวณอัตราการลดลงของแรงดัน (ΔV/day)
+
+    ส่ง df_sorted (เรียงตาม station_id, timestamp แล้ว) มาได้เพื่อไม่ต้อง
+    sort ซ้ำเมื่อหลายตัววิเคราะห์ใช้ข้อมูลชุดเดียวกัน"""
+    if df.empty:
+        return pd.DataFrame()
+
+    if pl is not None:
+        return _decay_rate_polars(df)
+
+    # Sort once then compute shift/diff over the whole frame - no per-station loop
+    if df_sorted is None:
+        df_sorted = df.sort_values(['station_id', 'timestamp'])
+    g = df_sorted.groupby('station_id', sort=False)
+
+    if njit is not None:
+        # Fused numba kernel walks the raw arrays once for both analyses
+        decay_rate = pd.Series(_station_scan(df_sorted)[0], index=df_sorted.index)
+    else:
+        # Voltage decay rate (V/day) vectorized across all stations at once
+        prev_voltage = g['battery_v'].shift(1)
+        days_diff = g['timestamp'].diff().dt.total_seconds() / (24 * 3600)
+        decay_rate = (prev_voltage - df_sorted['battery_v']) / days_diff
+
+    # Latest non-NaN decay rate per station (stations with < 2 rows drop out here)
+    latest_decay = df_sorted.assign(decay_rate=decay_rate).dropna(subset=['decay_rate'])
+    latest_decay = latest_decay.groupby('station_id', sort=False).tail(1)
+
+    if latest_decay.empty:
+        return pd.DataFrame()
+
+    # Latest row overall per station for name/current voltage/last update
+    last_rows = g.tail(1).set_index('station_id')
+    if 'name_th' in last_rows.columns:
+        names = last_rows['name_th']
+    elif 'name' in last_rows.columns:
+        names = last_rows['name']
+    else:
+        names = pd.Series('Unknown', index=last_rows.index)
+
+    station_ids = latest_decay['station_id']
+    return pd.DataFrame({
+        'station_id': station_ids.values,
+        'station_name': station_ids.map(names).values,
+        'decay_rate': latest_decay['decay_rate'].values,
+        'current_voltage': station_ids.map(last_rows['battery_v']).values,
+        'last_update': station_ids.map(last_rows['timestamp']).values
+    })
+
+def _df_fingerprint(df):
+    """ลายนิ้วมือราคาถูกของ frame ไว้เป็น cache key - ไม่ต้อง hash ทุก cell"""
+    if df.empty:
+        return (0,)
+    return (len(df), str(df['timestamp'].max()), float(df['battery_v'].sum()))
+
+
+@st.cache_data(ttl=600, hash_funcs={pd.DataFrame: lambda _: 0})
+def _sorted_cached(fingerprint, df):
+    """sort ตาม (station_id, timestamp) ครั้งเดียวต่อชุดข้อมูล - แชร์ให้ทุกตัววิเคราะห์"""
+    return df.sort_values(['station_id', 'timestamp'])
+
+
+@st.cache_data(ttl=600, hash_funcs={pd.DataFrame: lambda _: 0})
+def _decay_rates_cached(fingerprint, df):
+    """cache ผล decay rate ตาม fingerprint - ขยับ slider ที่ไม่เปลี่ยนข้อมูลจริง
+    จะไม่คำนวณซ้ำ (frame เองถูก hash เป็นค่าคงที่ ใช้ fingerprint เป็น key แทน)"""
+    return calculate_voltage_decay_rate(df, df_sorted=_sorted_cached(fingerprint, df))
+
+
+@st.cache_data(ttl=600, hash_funcs={pd.DataFrame: lambda _: 0})
+def _anomalies_cached(fingerprint, df):
+    """cache ผลตรวจจับค่าผิดปกติ keyed ด้วย fingerprint เช่นเดียวกับ decay"""
+    return detect_anomalies(df, df_sorted=_sorted_cached(fingerprint, df))
+
+
+def detect_anomalies(df, threshold_std=2.0, df_sorted=None):
+    """ตรวจจับค่าผิดปกติใน battery voltage"""
+    if df.empty:
+        return pd.DataFrame()
+
+    if pl is not None:
+        return _anomalies_polars(df, threshold_std)
+
+    if df_sorted is None:
+        df_sorted = df.sort_values(['station_id', 'timestamp'])
+
+    if njit is not None:
+        # Fused numba kernel - same pass that serves the decay analysis
+        _, exp_arr, z_arr = _station_scan(df_sorted)
+        rolling_mean = pd.Series(exp_arr, index=df_sorted.index)
+        z_score = pd.Series(z_arr, index=df_sorted.index)
+    else:
+        # Grouped rolling statistics over the whole frame - no per-station loop
+        grp = df_sorted.groupby('station_id', sort=False)['battery_v']
+        rolling_mean = grp.rolling(window=3, center=True).mean().reset_index(level=0, drop=True)
+        rolling_std = grp.rolling(window=3, center=True).std().reset_index(level=0, drop=True)
+
+        # Detect anomalies (voltage drop > threshold_std * std); stations with
+        # fewer than 3 rows fall out naturally because their rolling stats are NaN
+        z_score = ((df_sorted['battery_v'] - rolling_mean) / rolling_std).abs()
+    mask = z_score > threshold_std
+    if not mask.any():
+        return pd.DataFrame()
+
+    hits = df_sorted.loc[mask]
+    if 'name_th' in hits.columns:
+        names = hits['name_th'].values
+    elif 'name' in hits.columns:
+        names = hits['name'].values
+    else:
+        names = 'Unknown'
+
+    return pd.DataFrame({
+        'station_id': hits['station_id'].values,
+        'station_name': names,
+        'timestamp': hits['timestamp'].values,
+        'voltage': hits['battery_v'].values,
+        'expected_voltage': rolling_mean[mask].values,
+        'z_score': z_score[mask].values,
+        'voltage_drop': (rolling_mean[mask] - hits['battery_v']).values
+    })
+
+def create_battery_health_trend(df):
+    """สร้างกราฟแนวโน้มสุขภาพแบตเตอรี่"""
+    if df.empty:
+        return None
+    
+    if not _PLOTLY_OK:
+        st.error(_PLOTLY_MISSING_MSG)
+        return None
+    
+    # Group by the derived date key directly - no full-frame copy just to
+    # attach a helper column
+    date_key = df['timestamp'].dt.date.rename('date')
+
+    # Built-in reducers only - lambda aggregations would fall off pandas' C paths,
+    # and both quantiles come from a single multi-quantile call
+    g = df.groupby(date_key)['battery_v']
+    quantiles = g.quantile([0.25, 0.75]).unstack()
+    daily_stats = pd.DataFrame({
+        'median': g.median(),
+        'mean': g.mean(),
+        'q25': quantiles[0.25],
+        'q75': quantiles[0.75]
+    }).reset_index()
+    
+    # Create line chart
+    fig = go.Figure()
+    
+    # Add median line
+    fig.add_trace(go.Scatter(
+        x=daily_stats['date'],
+        y=daily_stats['median'],
+        mode='lines+markers',
+        name='Median Voltage',
+        line=dict(color='blue', width=3),
+        marker=dict(size=6)
+    ))
+    
+    # Add mean line
+    fig.add_trace(go.Scatter(
+        x=daily_stats['date'],
+        y=daily_stats['mean'],
+        mode='lines',
+        name='Mean Voltage',
+        line=dict(color='green', width=2, dash='dash')
+    ))
+    
+    # Add confidence interval (25th-75th percentile)
+    fig.add_trace(go.Scatter(
+        x=daily_stats['date'],
+        y=daily_stats['q75'],
+        mode='lines',
+        line=dict(width=0),
+        showlegend=False,
+        hoverinfo='skip'
+    ))
+    
+    fig.add_trace(go.Scatter(
+        x=daily_stats['date'],
+        y=daily_stats['q25'],
+        mode='lines',
+        line=dict(width=0),
+        fill='tonexty',
+        fillcolor='rgba(0,100,80,0.2)',
+        name='25th-75th Percentile',
+        hoverinfo='skip'
+    ))
+    
+    fig.update_layout(
+        title='Battery Health Trend - Median & Percentile Analysis',
+        xaxis_title='Date',
+        yaxis_title='Battery Voltage (V)',
+        hovermode='x unified',
+        template='plotly_white',
+        height=400
+    )
+    
+    return fig
+
+def create_decay_rate_ranking(decay_df):
+    """สร้างกราฟจัดอันดับอัตราการเสื่อมสภาพแบตเตอรี่"""
+    if decay_df.empty:
+        return None
+    
+    if not _PLOTLY_OK:
+        st.error(_PLOTLY_MISSING_MSG)
+        return None
+    
+    # Get top 15 stations with highest decay rate
+    top_decay = decay_df.nlargest(15, 'decay_rate')
+    
+    # Create bar chart
+    fig = px.bar(
+        top_decay,
+        x='decay_rate',
+        y='station_id',
+        orientation='h',
+        title='Battery Decay Rate Ranking (ΔV/day)',
+        labels={'decay_rate': 'Voltage Decay Rate (V/day)', 'station_id': 'Station ID'},
+        color='decay_rate',
+        color_continuous_scale='Reds'
+    )
+    
+    fig.update_layout(
+        yaxis={'categoryorder': 'total ascending'},
+        height=500,
+        template='plotly_white'
+    )
+    
+    return fig
+
+def create_anomaly_timeline(df, anomalies_df):
+    """สร้างกราฟไทม์ไลน์พร้อมจุดผิดปกติ"""
+    if df.empty:
+        return None
+    
+    if not _PLOTLY_OK:
+        st.error(_PLOTLY_MISSING_MSG)
+        return None
+    
+    fig = go.Figure()
+    
+    # Plot all station timelines as one WebGL trace with NaN line breaks -
+    # plotly treats NaN as a gap, so N stations cost one trace instead of N
+    xs, ys, labels = [], [], []
+    for station_id in df['station_id'].unique()[:10]:  # Limit to 10 stations for clarity
+        station_data = df[df['station_id'] == station_id].sort_values('timestamp')
+
+        xs.extend(station_data['timestamp'])
+        ys.extend(station_data['battery_v'])
+        labels.extend([f'Station {station_id}'] * len(station_data))
+        xs.append(None)
+        ys.append(np.nan)
+        labels.append('')
+
+    fig.add_trace(go.Scattergl(
+        x=xs,
+        y=ys,
+        mode='lines+markers',
+        name='Stations',
+        hovertext=labels,
+        line=dict(width=2),
+        marker=dict(size=4)
+    ))
+
+    # Add anomaly points
+    if not anomalies_df.empty:
+        fig.add_trace(go.Scattergl(
+            x=anomalies_df['timestamp'],
+            y=anomalies_df['voltage'],
+            mode='markers',
+            name='Anomalies',
+            marker=dict(
+                size=10,
+                color='red',
+                symbol='x',
+                line=dict(width=2, color='darkred')
+            ),
+            # Vectorized hover text - no row-wise apply
+            text=('Station: ' + anomalies_df['station_id'].astype(str)
+                  + '<br>Voltage Drop: '
+                  + np.char.mod('%.2f', anomalies_df['voltage_drop'].to_numpy())
+                  + 'V'),
+            hovertemplate='%{text}<extra></extra>'
+        ))
+    
+    fig.update_layout(
+        title='Battery Anomaly Timeline',
+        xaxis_title='Timestamp',
+        yaxis_title='Battery Voltage (V)',
+        hovermode='closest',
+        template='plotly_white',
+        height=400
+    )
+    
+    return fig
+
+def create_voltage_distribution(df):
+    """สร้าง boxplot การกระจายของแรงดันแบตเตอรี่"""
+    if df.empty:
+        return None
+    
+    if not _PLOTLY_OK:
+        st.error(_PLOTLY_MISSING_MSG)
+        return None
+    
+    # Create boxplot
+    fig = go.Figure()
+    
+    fig.add_trace(go.Box(
+        y=df['battery_v'],
+        name='All Stations',
+        boxpoints='outliers',
+        jitter=0.3,
+        pointpos=-1.8,
+        marker_color='lightblue',
+        line_color='darkblue'
+    ))
+    
+    fig.update_layout(
+        title='Battery Voltage Distribution Across All Stations',
+        yaxis_title='Battery Voltage (V)',
+        template='plotly_white',
+        height=400
+    )
+    
+    return fig
+
+def main():
+    """ฟังก์ชันหลักของ Dashboard"""
+    st.title("🔋 Battery Health Dashboard")
+    st.caption("พลังงานและสุขภาพของแบตเตอรี่สถานีวัดระดับน้ำฝน")
+    
+    # Load data
+    with st.spinner("กำลังโหลดข้อมูลสถานี..."):
+        df = load_latest()
+    
+    if df.empty:
+        st.error("❌ ไม่สามารถโหลดข้อมูลสถานีได้")
+        st.stop()
+    
+    # Sidebar filters
+    st.sidebar.header("🔧 ตัวกรองข้อมูล")
+    
+    # Date range filter
+    if 'timestamp' in df.columns:
+        # Extrema were cached at load time; fall back to the sorted ends
+        min_date = df.attrs.get('t_min', df['timestamp'].iloc[0]).date()
+        max_date = df.attrs.get('t_max', df['timestamp'].iloc[-1]).date()
+        
+        selected_date_range = st.sidebar.date_input(
+            "เลือกช่วงวันที่",
+            value=[min_date, max_date],
+            min_value=min_date,
+            max_value=max_date
+        )
+        
+        if len(selected_date_range) == 2:
+            start_date, end_date = selected_date_range
+            ts_ns = df.attrs.get('ts_ns')
+            if ts_ns is not None and len(ts_ns) == len(df):
+                # Rows come time-sorted from load_latest, so the selected
+                # window is one contiguous slice found by binary search
+                lo = np.searchsorted(ts_ns, pd.Timestamp(start_date).value, side='left')
+                hi = np.searchsorted(ts_ns, (pd.Timestamp(end_date) + pd.Timedelta(days=1)).value, side='left')
+                df = df.iloc[lo:hi]
+            else:
+                df = df[(df['timestamp'].dt.date >= start_date) & (df['timestamp'].dt.date <= end_date)]
+    
+    # Voltage range filter
+    # Slider bounds come from the load-time extrema: no column rescans per
+    # rerun, and the widget keeps stable bounds when the date filter changes
+    v_min = df.attrs.get('v_min', float(df['battery_v'].min()))
+    v_max = df.attrs.get('v_max', float(df['battery_v'].max()))
+    voltage_range = st.sidebar.slider(
+        "ช่วงแรงดันแบตเตอรี่ (V)",
+        min_value=v_min,
+        max_value=v_max,
+        value=(v_min, v_max)
+    )
+    
+    df = df[(df['battery_v'] >= voltage_range[0]) & (df['battery_v'] <= voltage_range[1])]
+    
+    # Calculate metrics - decay/anomalies ไม่คำนวณตรงนี้ ไปคำนวณแบบ lazy
+    # ในแท็บที่ใช้ผลจริงเท่านั้น (ผ่าน cache ที่ key ด้วย fingerprint)
+    metrics = calculate_battery_metrics(df)
+    fingerprint = _df_fingerprint(df)
+    
+    # Display key metrics
+    st.subheader("📊 ภาพรวมสุขภาพแบตเตอรี่")
+    
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        st.metric("จำนวนสถานี", metrics.get('total_stations', 0))
+    
+    with col2:
+        avg_v = metrics.get('avg_voltage', 0)
+        st.metric("แรงดันเฉลี่ย", f"{avg_v:.2f} V")
+    
+    with col3:
+        critical = metrics.get('critical_low', 0)
+        st.metric("แรงดันต่ำวิกฤต", critical, delta=f"{critical} สถานี")
+    
+    with col4:
+        normal = metrics.get('normal', 0)
+        total = metrics.get('total_stations', 1)
+        health_pct = (normal / total) * 100
+        st.metric("สถานีปกติ", f"{health_pct:.1f}%")
+    
+    # Battery status distribution
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        # Create pie chart for voltage status
+        status_data = {
+            'วิกฤตต่ำ (<11V)': metrics.get('critical_low', 0),
+            'ต่ำ (11-12V)': metrics.get('low', 0),
+            'ปกติ (12-14V)': metrics.get('normal', 0),
+            'สูง (>14V)': metrics.get('high', 0)
+        }
+        
+        if not _PLOTLY_OK:
+            st.error(_PLOTLY_MISSING_MSG)
+            return
+        
+        fig_pie = px.pie(
+            values=list(status_data.values()),
+            names=list(status_data.keys()),
+            title="สถานะแรงดันแบตเตอรี่"
+        )
+        fig_pie.update_layout(height=300)
+        st.plotly_chart(fig_pie, width="stretch")
+    
+    with col2:
+        # Display statistics
+        st.subheader("สถิติแรงดัน")
+        st.write(f"**ค่าเฉลี่ย:** {metrics.get('avg_voltage', 0):.2f} V")
+        st.write(f"**ค่ามัธยฐาน:** {metrics.get('median_voltage', 0):.2f} V")
+        st.write(f"**ช่วง 25-75%:** {metrics.get('p25_voltage', 0):.2f} - {metrics.get('p75_voltage', 0):.2f} V")
+        st.write(f"**ส่วนเบี่ยงเบนมาตรฐาน:** {metrics.get('std_voltage', 0):.2f} V")
+    
+    # Main charts - แยกเป็นแท็บ แต่ละแท็บคำนวณเฉพาะข้อมูลที่ตัวเองใช้
+    st.subheader("📈 กราฟวิเคราะห์สุขภาพแบตเตอรี่")
+
+    tab_trend, tab_decay, tab_anomaly, tab_dist = st.tabs(
+        ["Trend", "Decay Ranking", "Anomalies", "Distribution"])
+
+    with tab_trend:
+        # Battery Health Trend
+        st.write("### 1. Battery Health Trend (ค่า median/percentile ของ battery_v ตามเวลา)")
+        trend_fig = create_battery_health_trend(df)
+        if trend_fig:
+            st.plotly_chart(trend_fig, width="stretch")
+
+    with tab_decay:
+        # Battery Decay Rate Ranking - decay_rates computed only in this branch
+        st.write("### 2. Battery Decay Rate Ranking (แสดงสถานีที่ ΔV/day สูงสุด)")
+        decay_rates = _decay_rates_cached(fingerprint, df)
+        decay_fig = create_decay_rate_ranking(decay_rates)
+        if decay_fig:
+            st.plotly_chart(decay_fig, width="stretch")
+
+        # Top 10 stations with fastest voltage decay
+        st.subheader("🏆 Top 10 สถานีที่แรงดันตกเร็วที่สุด")
+
+        if not decay_rates.empty:
+            top_10_decay = decay_rates.nlargest(10, 'decay_rate')
+
+            # Format table
+            display_df = top_10_decay.copy()
+            display_df['decay_rate'] = display_df['decay_rate'].round(3)
+            display_df['current_voltage'] = display_df['current_voltage'].round(2)
+            display_df['last_update'] = display_df['last_update'].dt.strftime('%Y-%m-%d %H:%M')
+
+            display_df = display_df.rename(columns={
+                'station_id': 'รหัสสถานี',
+                'station_name': 'ชื่อสถานี',
+                'decay_rate': 'อัตราการลด (V/day)',
+                'current_voltage': 'แรงดันปัจจุบัน (V)',
+                'last_update': 'อัปเดตล่าสุด'
+            })
+
+            st.dataframe(display_df, width="stretch", hide_index=True)
+
+            # Add warning for critical stations - test the mask directly,
+            # no need to materialize the filtered subset
+            if (display_df['อัตราการลด (V/day)'] > 0.1).any():
+                st.markdown('<div class="warning-box">⚠️ <strong>คำเตือน:</strong> มีสถานีที่แรงดันตกเร็วผิดปกติ (>0.1 V/day) ควรตรวจสอบโดยเร่งด่วน!</div>', unsafe_allow_html=True)
+        else:
+            st.info("ไม่มีข้อมูลการเสื่อมสภาพของแบตเตอรี่")
+
+    with tab_anomaly:
+        # Battery Anomaly Timeline - anomalies computed only in this branch
+        st.write("### 3. Battery Anomaly Timeline (แรงดันตกเร็วผิดปกติ)")
+        anomalies = _anomalies_cached(fingerprint, df)
+        anomaly_fig = create_anomaly_timeline(df, anomalies)
+        if anomaly_fig:
+            st.plotly_chart(anomaly_fig, width="stretch")
+
+        # Anomaly detection results
+        if not anomalies.empty:
+            st.subheader("🚨 ตรวจพบค่าผิดปกติ")
+
+            # Show recent anomalies - build every card in one vectorized
+            # string concat and ship them in a single st.markdown call
+            # instead of one WebSocket round-trip per card
+            recent_anomalies = anomalies.nlargest(10, 'voltage_drop')
+
+            cards = (
+                '<div class="warning-box"><strong>สถานี '
+                + recent_anomalies['station_id'].astype(str)
+                + '</strong> - '
+                + recent_anomalies['timestamp'].dt.strftime('%Y-%m-%d %H:%M')
+                + '<br>แรงดัน: '
+                + np.char.mod('%.2f', recent_anomalies['voltage'].to_numpy())
+                + 'V (คาดว่า: '
+                + np.char.mod('%.2f', recent_anomalies['expected_voltage'].to_numpy())
+                + 'V)<br>การตกลง: '
+                + np.char.mod('%.2f', recent_anomalies['voltage_drop'].to_numpy())
+                + 'V (Z-score: '
+                + np.char.mod('%.2f', recent_anomalies['z_score'].to_numpy())
+                + ')</div>'
+            )
+            st.markdown(cards.str.cat(sep='\n'), unsafe_allow_html=True)
+
+    with tab_dist:
+        # Voltage Distribution
+        st.write("### 4. Distribution ของ battery_v ทุกสถานี")
+        dist_fig = create_voltage_distribution(df)
+        if dist_fig:
+            st.plotly_chart(dist_fig, width="stretch")
+    
+    # Footer
+    st.markdown("---")
+    st.markdown('<p style="text-align: center; color: #666;">📊 Battery Health Dashboard - Real-time Monitoring System</p>', unsafe_allow_html=True)
+
+if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,678 +1,833 @@
-import streamlit as st
-import pandas as pd
-import json
-import numpy as np
-from datetime import datetime, timedelta
-import pathlib
-import warnings
-warnings.filterwarnings('ignore')
-
-# Set page configuration prefix for session state
-PAGE_KEY_PREFIX = "solar_"
-
-# Custom CSS for better styling
-st.markdown("""
-<style>
-    .main-header {
-        font-size: 2.5rem;
-        color: #f39c12;
-        text-align: center;
-        margin-bottom: 2rem;
-    }
-    .metric-card {
-        background-color: #f0f2f6;
-        padding: 1rem;
-        border-radius: 0.5rem;
-        border-left: 5px solid #f39c12;
-    }
-    .warning-box {
-        background-color: #fff3cd;
-        border: 1px solid #ffeaa7;
-        border-radius: 0.5rem;
-        padding: 1rem;
-        margin: 1rem 0;
-    }
-    .success-box {
-        background-color: #d4edda;
-        border: 1px solid #c3e6cb;
-        border-radius: 0.5rem;
-        padding: 1rem;
-        margin: 1rem 0;
-    }
-    .critical-box {
-        background-color: #f8d7da;
-        border: 1px solid #f5c6cb;
-        border-radius: 0.5rem;
-        padding: 1rem;
-        margin: 1rem 0;
-    }
-</style>
-""", unsafe_allow_html=True)
-
-@st.cache_data(ttl=600)
-def load_latest():
-    """โหลดข้อมูลจาก data/latest.json"""
-    BASE_DIR = pathlib.Path(__file__).resolve().parents[1]
-    DATA_DIR = BASE_DIR / "data"
-    LATEST_PATH = DATA_DIR / "latest.json"
-    
-    try:
-        with open(LATEST_PATH, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        
-        # Extract station data
-        stations = data.get("stations", [])
-        df = pd.DataFrame(stations)
-        
-        # Normalize station ID column
-        if 'station_id' not in df.columns:
-            if 'station_code' in df.columns:
-                df['station_id'] = df['station_code']
-            elif 'code' in df.columns:
-                df['station_id'] = df['code']
-        
-        # Convert date columns
-        if 'date_iso' in df.columns:
-            df['timestamp'] = pd.to_datetime(df['date_iso'], errors='coerce')
-        elif 'date' in df.columns:
-            df['timestamp'] = pd.to_datetime(df['date'], errors='coerce')
-        
-        # Filter out stations with missing solar data
-        df = df.dropna(subset=['solar_volt_v', 'timestamp'])
-        
-        return df
-    
-    except Exception as e:
-        st.error(f"❌ โหลดข้อมูลล้มเหลว: {e}")
-        return pd.DataFrame()
-
-def calculate_solar_metrics(df):
-    """คำนวณ metrics สำหรับ solar panel performance"""
-    if df.empty:
-        return {}
-    
-    # Get the latest reading for each station to avoid counting duplicates
-    df_latest = df.sort_values('timestamp').groupby('station_id').tail(1)
-    
-    # Basic statistics
-    metrics = {
-        'total_stations': df_latest['station_id'].nunique(),
-        'avg_solar_voltage': df_latest['solar_volt_v'].mean(),
-        'min_solar_voltage': df_latest['solar_volt_v'].min(),
-        'max_solar_voltage': df_latest['solar_volt_v'].max(),
-        'std_solar_voltage': df_latest['solar_volt_v'].std(),
-        'median_solar_voltage': df_latest['solar_volt_v'].median(),
-        'p25_solar_voltage': df_latest['solar_volt_v'].quantile(0.25),
-        'p75_solar_voltage': df_latest['solar_volt_v'].quantile(0.75)
-    }
-    
-    # Count stations by voltage ranges (using unique stations)
-    metrics['critical_low'] = df_latest[df_latest['solar_volt_v'] < 13.0]['station_id'].nunique()
-    metrics['low'] = df_latest[(df_latest['solar_volt_v'] >= 13.0) & (df_latest['solar_volt_v'] < 15.0)]['station_id'].nunique()
-    metrics['normal'] = df_latest[(df_latest['solar_volt_v'] >= 15.0) & (df_latest['solar_volt_v'] <= 18.0)]['station_id'].nunique()
-    metrics['high'] = df_latest[df_latest['solar_volt_v'] > 18.0]['station_id'].nunique()
-    
-    # Count by status (using unique stations)
-    if 'status' in df_latest.columns:
-        metrics['timeout_count'] = df_latest[df_latest['status'] == 'TIMEOUT']['station_id'].nunique()
-        metrics['disconnect_count'] = df_latest[df_latest['status'] == 'DISCONNECT']['station_id'].nunique()
-        metrics['online_count'] = df_latest[df_latest['status'] == 'ONLINE']['station_id'].nunique()
-    
-    return metrics
-
-def detect_low_solar_stations(df, threshold_days=3, voltage_threshold=13.0):
-    """ตรวจจับสถานีที่มีแรงดันโซลาร์ต่ำเป็นเวลาติดต่อง"""
-    if df.empty:
-        return pd.DataFrame()
-    
-    low_solar_stations = []
-    
-    for station_id in df['station_id'].unique():
-        station_data = df[df['station_id'] == station_id].copy()
-        
-        if len(station_data) < threshold_days:
-            continue
-        
-        # Sort by timestamp
-        station_data = station_data.sort_values('timestamp')
-        
-        # Check for consecutive days with low solar voltage
-        station_data['date'] = station_data['timestamp'].dt.date
-        station_data['is_low'] = station_data['solar_volt_v'] < voltage_threshold
-        
-        # Group by date and check if any day has low solar
-        daily_low = station_data.groupby('date')['is_low'].any().reset_index()
-        
-        # Find consecutive days with low solar
-        consecutive_count = 0
-        max_consecutive = 0
-        
-        for is_low in daily_low['is_low']:
-            if is_low:
-                consecutive_count += 1
-                max_consecutive = max(max_consecutive, consecutive_count)
-            else:
-                consecutive_count = 0
-        
-        if max_consecutive >= threshold_days:
-            latest_data = station_data.iloc[-1]
-            low_solar_stations.append({
-                'station_id': station_id,
-                'station_name': latest_data.get('name_th', latest_data.get('name', 'Unknown')),
-                'consecutive_low_days': max_consecutive,
-                'latest_solar_voltage': latest_data['solar_volt_v'],
-                'latest_battery_voltage': latest_data.get('battery_v', np.nan),
-                'latest_status': latest_data.get('status', 'UNKNOWN'),
-                'last_update': latest_data['timestamp']
-            })
-    
-    return pd.DataFrame(low_solar_stations)
-
-def create_solar_performance_scatter(df):
-    """สร้างกราฟ Solar Performance vs Issues"""
-    if df.empty:
-        return None
-    
-    # Lazy import plotly with error handling
-    try:
-        import plotly.graph_objects as go
-    except Exception as e:
-        st.error("ต้องติดตั้ง plotly เพื่อแสดงกราฟ: เพิ่ม 'plotly' ใน requirements แล้ว redeploy")
-        return None
-    
-    # Filter stations with issues (TIMEOUT or DISCONNECT)
-    df_issues = df[df['status'].isin(['TIMEOUT', 'DISCONNECT'])].copy()
-    df_normal = df[df['status'] == 'ONLINE'].copy()
-    
-    fig = go.Figure()
-    
-    # Add normal stations
-    if not df_normal.empty:
-        fig.add_trace(go.Scatter(
-            x=df_normal['solar_volt_v'],
-            y=[1] * len(df_normal),
-            mode='markers',
-            name='ONLINE',
-            marker=dict(
-                color='green',
-                size=8,
-                opacity=0.7
-            ),
-            text=df_normal.apply(lambda x: f"Station: {x['station_id']}<br>Solar: {x['solar_volt_v']:.1f}V", axis=1),
-            hovertemplate='%{text}<extra></extra>'
-        ))
-    
-    # Add TIMEOUT stations
-    timeout_data = df_issues[df_issues['status'] == 'TIMEOUT']
-    if not timeout_data.empty:
-        fig.add_trace(go.Scatter(
-            x=timeout_data['solar_volt_v'],
-            y=[2] * len(timeout_data),
-            mode='markers',
-            name='TIMEOUT',
-            marker=dict(
-                color='orange',
-                size=10,
-                opacity=0.8,
-                symbol='triangle-up'
-            ),
-            text=timeout_data.apply(lambda x: f"Station: {x['station_id']}<br>Solar: {x['solar_volt_v']:.1f}V", axis=1),
-            hovertemplate='%{text}<extra></extra>'
-        ))
-    
-    # Add DISCONNECT stations
-    disconnect_data = df_issues[df_issues['status'] == 'DISCONNECT']
-    if not disconnect_data.empty:
-        fig.add_trace(go.Scatter(
-            x=disconnect_data['solar_volt_v'],
-            y=[3] * len(disconnect_data),
-            mode='markers',
-            name='DISCONNECT',
-            marker=dict(
-                color='red',
-                size=10,
-                opacity=0.8,
-                symbol='x'
-            ),
-            text=disconnect_data.apply(lambda x: f"Station: {x['station_id']}<br>Solar: {x['solar_volt_v']:.1f}V", axis=1),
-            hovertemplate='%{text}<extra></extra>'
-        ))
-    
-    # Add threshold lines
-    fig.add_vline(x=13.0, line_dash="dash", line_color="red", annotation_text="Min Threshold (13V)")
-    fig.add_vline(x=18.0, line_dash="dash", line_color="orange", annotation_text="Max Threshold (18V)")
-    
-    fig.update_layout(
-        title='Solar Performance vs Station Status',
-        xaxis_title='Solar Panel Voltage (V)',
-        yaxis_title='Station Status',
-        yaxis=dict(
-            tickvals=[1, 2, 3],
-            ticktext=['ONLINE', 'TIMEOUT', 'DISCONNECT']
-        ),
-        hovermode='closest',
-        template='plotly_white',
-        height=400
-    )
-    
-    return fig
-
-def create_solar_battery_correlation(df):
-    """สร้างกราฟ Solar-Battery Correlation"""
-    if df.empty:
-        return None
-    
-    # Lazy import plotly with error handling
-    try:
-        import plotly.graph_objects as go
-    except Exception as e:
-        st.error("ต้องติดตั้ง plotly เพื่อแสดงกราฟ: เพิ่ม 'plotly' ใน requirements แล้ว redeploy")
-        return None
-    
-    # Filter out rows with missing battery data
-    df_corr = df.dropna(subset=['battery_v', 'solar_volt_v']).copy()
-    
-    if df_corr.empty:
-        return None
-    
-    fig = go.Figure()
-    
-    # Add scatter plot
-    fig.add_trace(go.Scatter(
-        x=df_corr['solar_volt_v'],
-        y=df_corr['battery_v'],
-        mode='markers',
-        name='Stations',
-        marker=dict(
-            color=df_corr['solar_volt_v'],
-            colorscale='Viridis',
-            size=8,
-            opacity=0.7,
-            colorbar=dict(title="Solar Voltage (V)")
-        ),
-        text=df_corr.apply(lambda x: f"Station: {x['station_id']}<br>Solar: {x['solar_volt_v']:.1f}V<br>Battery: {x['battery_v']:.1f}V", axis=1),
-        hovertemplate='%{text}<extra></extra>'
-    ))
-    
-    # Add threshold lines
-    fig.add_vline(x=13.0, line_dash="dash", line_color="red", annotation_text="Min Solar (13V)")
-    fig.add_vline(x=18.0, line_dash="dash", line_color="orange", annotation_text="Max Solar (18V)")
-    fig.add_hline(y=12.0, line_dash="dash", line_color="red", annotation_text="Min Battery (12V)")
-    
-    # Calculate and add trend line
-    if len(df_corr) > 1:
-        z = np.polyfit(df_corr['solar_volt_v'], df_corr['battery_v'], 1)
-        p = np.poly1d(z)
-        x_trend = np.linspace(df_corr['solar_volt_v'].min(), df_corr['solar_volt_v'].max(), 100)
-        y_trend = p(x_trend)
-        
-        fig.add_trace(go.Scatter(
-            x=x_trend,
-            y=y_trend,
-            mode='lines',
-            name='Trend Line',
-            line=dict(color='red', width=2, dash='dot')
-        ))
-    
-    fig.update_layout(
-        title='Solar Panel Voltage vs Battery Voltage Correlation',
-        xaxis_title='Solar Panel Voltage (V)',
-        yaxis_title='Battery Voltage (V)',
-        hovermode='closest',
-        template='plotly_white',
-        height=400
-    )
-    
-    return fig
-
-def create_solar_daily_profile(df):
-    """สร้างกราฟ Solar Voltage Daily Profile"""
-    if df.empty:
-        return None
-    
-    # Lazy import plotly with error handling
-    try:
-        import plotly.graph_objects as go
-    except Exception as e:
-        st.error("ต้องติดตั้ง plotly เพื่อแสดงกราฟ: เพิ่ม 'plotly' ใน requirements แล้ว redeploy")
-        return None
-    
-    # Create hourly profile
-    df['hour'] = df['timestamp'].dt.hour
-    hourly_stats = df.groupby('hour')['solar_volt_v'].agg(['mean', 'median', 'std']).reset_index()
-    
-    fig = go.Figure()
-    
-    # Add median line
-    fig.add_trace(go.Scatter(
-        x=hourly_stats['hour'],
-        y=hourly_stats['median'],
-        mode='lines+markers',
-        name='Median Solar Voltage',
-        line=dict(color='orange', width=3),
-        marker=dict(size=6)
-    ))
-    
-    # Add mean line
-    fig.add_trace(go.Scatter(
-        x=hourly_stats['hour'],
-        y=hourly_stats['mean'],
-        mode='lines',
-        name='Mean Solar Voltage',
-        line=dict(color='blue', width=2, dash='dash')
-    ))
-    
-    # Add confidence interval (±1 std)
-    fig.add_trace(go.Scatter(
-        x=hourly_stats['hour'],
-        y=hourly_stats['mean'] + hourly_stats['std'],
-        mode='lines',
-        line=dict(width=0),
-        showlegend=False,
-        hoverinfo='skip'
-    ))
-    
-    fig.add_trace(go.Scatter(
-        x=hourly_stats['hour'],
-        y=hourly_stats['mean'] - hourly_stats['std'],
-        mode='lines',
-        line=dict(width=0),
-        fill='tonexty',
-        fillcolor='rgba(255,165,0,0.2)',
-        name='±1 Std Dev',
-        hoverinfo='skip'
-    ))
-    
-    # Add threshold lines
-    fig.add_hline(y=13.0, line_dash="dash", line_color="red", annotation_text="Min Threshold (13V)")
-    fig.add_hline(y=18.0, line_dash="dash", line_color="orange", annotation_text="Max Threshold (18V)")
-    
-    fig.update_layout(
-        title='Solar Voltage Daily Profile (Hourly Average)',
-        xaxis_title='Hour of Day',
-        yaxis_title='Solar Panel Voltage (V)',
-        hovermode='x unified',
-        template='plotly_white',
-        height=400
-    )
-    
-    return fig
-
-def create_undercharge_event_rate(df):
-    """สร้างกราฟ Under-charge Event Rate"""
-    if df.empty:
-        return None
-    
-    # Lazy import plotly with error handling
-    try:
-        import plotly.graph_objects as go
-        from plotly.subplots import make_subplots
-    except Exception as e:
-        st.error("ต้องติดตั้ง plotly เพื่อแสดงกราฟ: เพิ่ม 'plotly' ใน requirements แล้ว redeploy")
-        return None
-    
-    # Create daily analysis
-    df['date'] = df['timestamp'].dt.date
-    
-    # Count under-charge events per day (solar < 13V AND status is TIMEOUT/DISCONNECT)
-    daily_events = df[df['solar_volt_v'] < 13.0].copy()
-    daily_events = daily_events[daily_events['status'].isin(['TIMEOUT', 'DISCONNECT'])]
-    
-    if daily_events.empty:
-        return None
-    
-    event_counts = daily_events.groupby('date').size().reset_index(name='undercharge_events')
-    
-    # Calculate total stations per day for percentage
-    daily_totals = df.groupby('date').size().reset_index(name='total_stations')
-    
-    # Merge and calculate percentage
-    event_stats = pd.merge(event_counts, daily_totals, on='date', how='right')
-    event_stats['undercharge_events'] = event_stats['undercharge_events'].fillna(0)
-    event_stats['event_rate'] = (event_stats['undercharge_events'] / event_stats['total_stations']) * 100
-    
-    fig = make_subplots(
-        rows=2, cols=1,
-        subplot_titles=('Number of Under-charge Events per Day', 'Under-charge Event Rate (%)'),
-        vertical_spacing=0.1
-    )
-    
-    # Add bar chart for event counts
-    fig.add_trace(
-        go.Bar(
-            x=event_stats['date'],
-            y=event_stats['undercharge_events'],
-            name='Event Count',
-            marker_color='red'
-        ),
-        row=1, col=1
-    )
-    
-    # Add line chart for event rate
-    fig.add_trace(
-        go.Scatter(
-            x=event_stats['date'],
-            y=event_stats['event_rate'],
-            mode='lines+markers',
-            name='Event Rate (%)',
-            line=dict(color='orange', width=2),
-            marker=dict(size=6)
-        ),
-        row=2, col=1
-    )
-    
-    fig.update_layout(
-        title='Under-charge Event Analysis (Low Solar + High Timeout/Disconnect)',
-        height=600,
-        template='plotly_white',
-        showlegend=True
-    )
-    
-    fig.update_xaxes(title_text="Date", row=2, col=1)
-    fig.update_yaxes(title_text="Number of Events", row=1, col=1)
-    fig.update_yaxes(title_text="Event Rate (%)", row=2, col=1)
-    
-    return fig
-
-def main():
-    """ฟังก์ชันหลักของ Dashboard"""
-    st.title("☀️ Solar Panel Dashboard")
-    st.caption("การทำงานของแผงโซลาร์สถานีวัดระดับน้ำฝน")
-    
-    # Load data
-    with st.spinner("กำลังโหลดข้อมูลสถานี..."):
-        df = load_latest()
-    
-    if df.empty:
-        st.error("❌ ไม่สามารถโหลดข้อมูลสถานีได้")
-        st.stop()
-    
-    # Create a base dataframe for calculating ONLINE status (not affected by filters)
-    df_base = df.copy()
-    
-    # Calculate ONLINE percentage from base data
-    if 'status' in df_base.columns:
-        total_stations = df_base['station_id'].nunique()
-        online_stations = df_base.loc[df_base['status'].str.upper() == 'ONLINE', 'station_id'].nunique()
-        online_pct = round(100 * online_stations / max(total_stations, 1), 1)
-    else:
-        total_stations = df_base['station_id'].nunique()
-        online_pct = 0.0
-    
-    # Calculate normal voltage percentage from base data
-    if 'solar_volt_v' in df_base.columns:
-        # Group by station to get the latest reading per station
-        df_voltage = df_base.dropna(subset=['solar_volt_v']).copy()
-        if not df_voltage.empty:
-            # Get the latest reading for each station
-            df_voltage = df_voltage.sort_values('timestamp').groupby('station_id').tail(1)
-            normal_voltage_count = df_voltage[(df_voltage['solar_volt_v'] >= 15.0) & (df_voltage['solar_volt_v'] <= 18.0)]['station_id'].nunique()
-            valid_voltage_count = df_voltage['station_id'].nunique()
-            normal_voltage_pct = round(100 * normal_voltage_count / max(valid_voltage_count, 1), 1)
-        else:
-            normal_voltage_pct = 0.0
-    else:
-        normal_voltage_pct = 0.0
-    
-    # Sidebar filters
-    st.sidebar.header("🔧 ตัวกรองข้อมูล")
-    
-    # Date range filter
-    if 'timestamp' in df.columns:
-        min_date = df['timestamp'].min().date()
-        max_date = df['timestamp'].max().date()
-        
-        selected_date_range = st.sidebar.date_input(
-            "เลือกช่วงวันที่",
-            value=[min_date, max_date],
-            min_value=min_date,
-            max_value=max_date
-        )
-        
-        if len(selected_date_range) == 2:
-            start_date, end_date = selected_date_range
-            df = df[(df['timestamp'].dt.date >= start_date) & (df['timestamp'].dt.date <= end_date)]
-    
-    # Solar voltage range filter
-    voltage_range = st.sidebar.slider(
-        "ช่วงแรงดันโซลาร์ (V)",
-        min_value=float(df['solar_volt_v'].min()),
-        max_value=float(df['solar_volt_v'].max()),
-        value=(float(df['solar_volt_v'].min()), float(df['solar_volt_v'].max()))
-    )
-    
-    df = df[(df['solar_volt_v'] >= voltage_range[0]) & (df['solar_volt_v'] <= voltage_range[1])]
-    
-    # Status filter
-    if 'status' in df.columns:
-        status_options = df['status'].unique().tolist()
-        selected_status = st.sidebar.multiselect(
-            "เลือกสถานะสถานี",
-            options=status_options,
-            default=status_options
-        )
-        df = df[df['status'].isin(selected_status)]
-    
-    # Calculate metrics
-    metrics = calculate_solar_metrics(df)
-    low_solar_stations = detect_low_solar_stations(df)
-    
-    # Display key metrics
-    st.subheader("📊 ภาพรวมสุขภาพแผงโซลาร์")
-    
-    col1, col2, col3, col4 = st.columns(4)
-    
-    with col1:
-        st.metric("จำนวนสถานี", total_stations)
-    
-    with col2:
-        avg_v = metrics.get('avg_solar_voltage', 0)
-        st.metric("แรงดันเฉลี่ย", f"{avg_v:.2f} V")
-    
-    with col3:
-        critical = metrics.get('critical_low', 0)
-        st.metric("แรงดันต่ำวิกฤต", critical, delta=f"{critical} สถานี")
-    
-    with col4:
-        st.metric("สถานีปกติ (ONLINE)", f"{online_pct:.1f}%")
-    
-    # Add a second row for the normal voltage metric
-    col1, col2, col3, col4 = st.columns(4)
-    
-    with col1:
-        st.metric("แรงดันปกติ (15-18V)", f"{normal_voltage_pct:.1f}%")
-    
-    # Solar status distribution
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        # Create pie chart for voltage status
-        status_data = {
-            'วิกฤตต่ำ (<13V)': metrics.get('critical_low', 0),
-            'ต่ำ (13-15V)': metrics.get('low', 0),
-            'ปกติ (15-18V)': metrics.get('normal', 0),
-            'สูง (>18V)': metrics.get('high', 0)
-        }
-        
-        # Lazy import plotly with error handling
-        try:
-            import plotly.express as px
-        except Exception as e:
-            st.error("ต้องติดตั้ง plotly เพื่อแสดงกราฟ: เพิ่ม 'plotly' ใน requirements แล้ว redeploy")
-            return
-        
-        fig_pie = px.pie(
-            values=list(status_data.values()),
-            names=list(status_data.keys()),
-            title="สถานะแรงดันโซลาร์"
-        )
-        fig_pie.update_layout(height=300)
-        st.plotly_chart(fig_pie, width="stretch")
-    
-    with col2:
-        # Display statistics
-        st.subheader("สถิติแรงดันโซลาร์")
-        st.write(f"**ค่าเฉลี่ย:** {metrics.get('avg_solar_voltage', 0):.2f} V")
-        st.write(f"**ค่ามัธยฐาน:** {metrics.get('median_solar_voltage', 0):.2f} V")
-        st.write(f"**ช่วง 25-75%:** {metrics.get('p25_solar_voltage', 0):.2f} - {metrics.get('p75_solar_voltage', 0):.2f} V")
-        st.write(f"**ส่วนเบี่ยงเบนมาตรฐาน:** {metrics.get('std_solar_voltage', 0):.2f} V")
-    
-    # Main charts
-    st.subheader("📈 กราฟวิเคราะห์การทำงานแผงโซลาร์")
-    
-    # Solar Performance vs Issues
-    st.write("### 1. Solar Performance vs Station Issues (solar_volt_v เทียบกับ TIMEOUT/DISCONNECT)")
-    perf_fig = create_solar_performance_scatter(df)
-    if perf_fig:
-        st.plotly_chart(perf_fig, width="stretch")
-    
-    # Solar-Battery Correlation
-    st.write("### 2. Solar-Battery Correlation (solar_volt_v vs battery_v)")
-    corr_fig = create_solar_battery_correlation(df)
-    if corr_fig:
-        st.plotly_chart(corr_fig, width="stretch")
-    
-    # Solar Voltage Daily Profile
-    st.write("### 3. Solar Voltage Daily Profile (แรงดันโซลาร์รายวัน)")
-    profile_fig = create_solar_daily_profile(df)
-    if profile_fig:
-        st.plotly_chart(profile_fig, width="stretch")
-    
-    # Under-charge Event Rate
-    st.write("### 4. Under-charge Event Rate (จำนวนวันที่ Solar ต่ำ + Timeout สูง)")
-    undercharge_fig = create_undercharge_event_rate(df)
-    if undercharge_fig:
-        st.plotly_chart(undercharge_fig, width="stretch")
-    
-    # Low Solar Stations Alert
-    st.subheader("🚨 แจ้งเตือนสถานีที่มีปัญหาแผงโซลาร์")
-    
-    if not low_solar_stations.empty:
-        st.markdown('<div class="critical-box">⚠️ <strong>คำเตือน:</strong> พบสถานีที่มีแรงดันโซลาร์ต่ำเป็นเวลาติดต่อง 3 วันขึ้นไป!</div>', unsafe_allow_html=True)
-        
-        # Format table
-        display_df = low_solar_stations.copy()
-        display_df['latest_solar_voltage'] = display_df['latest_solar_voltage'].round(2)
-        display_df['latest_battery_voltage'] = display_df['latest_battery_voltage'].round(2)
-        display_df['last_update'] = display_df['last_update'].dt.strftime('%Y-%m-%d %H:%M')
-        
-        display_df = display_df.rename(columns={
-            'station_id': 'รหัสสถานี',
-            'station_name': 'ชื่อสถานี',
-            'consecutive_low_days': 'จำนวนวันติดต่อง',
-            'latest_solar_voltage': 'แรงดันโซลาร์ล่าสุด (V)',
-            'latest_battery_voltage': 'แรงดันแบตเตอรี่ล่าสุด (V)',
-            'latest_status': 'สถานะล่าสุด',
-            'last_update': 'อัปเดตล่าสุด'
-        })
-        
-        st.dataframe(display_df, width="stretch", hide_index=True)
-    else:
-        st.markdown('<div class="success-box">✅ ไม่พบสถานีที่มีแรงดันโซลาร์ต่ำเป็นเวลาติดต่อง 3 วันขึ้นไป</div>', unsafe_allow_html=True)
-    
-    # Footer
-    st.markdown("---")
-    st.markdown('<p style="text-align: center; color: #666;">☀️ Solar Panel Dashboard - Real-time Monitoring System</p>', unsafe_allow_html=True)
-
-if __name__ == "__main__":
+import streamlit as st
+import pandas as pd
+import json
+import numpy as np
+from datetime import datetime, timedelta
+import pathlib
+import warnings
+warnings.filterwarnings('ignore')
+
+try:
+    import pyarrow  # engine สำหรับ parquet cache บนดิสก์
+except ImportError:
+    pyarrow = None
+
+try:
+    from numba import njit, prange  # optional - scan หาวันต่ำติดต่อกันแบบ compiled
+except ImportError:
+    njit = None
+    prange = range
+
+# import plotly ครั้งเดียวที่ระดับโมดูล แทน try/except ซ้ำในทุกฟังก์ชันกราฟ
+try:
+    import plotly.graph_objects as go
+    import plotly.express as px
+    from plotly.subplots import make_subplots
+    _PLOTLY_OK = True
+except Exception:
+    _PLOTLY_OK = False
+
+_PLOTLY_MSG = "ต้องติดตั้ง plotly เพื่อแสดงกราฟ: เพิ่ม 'plotly' ใน requirements แล้ว redeploy"
+
+# Set page configuration prefix for session state
+PAGE_KEY_PREFIX = "solar_"
+
+# Custom CSS for better styling
+st.markdown("""
+<style>
+    .main-header {
+        font-size: 2.5rem;
+        color: #f39c12;
+        text-align: center;
+        margin-bottom: 2rem;
+    }
+    .metric-card {
+        background-color: #f0f2f6;
+        padding: 1rem;
+        border-radius: 0.5rem;
+        border-left: 5px solid #f39c12;
+    }
+    .warning-box {
+        background-color: #fff3cd;
+        border: 1px solid #ffeaa7;
+        border-radius: 0.5rem;
+        padding: 1rem;
+        margin: 1rem 0;
+    }
+    .success-box {
+        background-color: #d4edda;
+        border: 1px solid #c3e6cb;
+        border-radius: 0.5rem;
+        padding: 1rem;
+        margin: 1rem 0;
+    }
+    .critical-box {
+        background-color: #f8d7da;
+        border: 1px solid #f5c6cb;
+        border-radius: 0.5rem;
+        padding: 1rem;
+        margin: 1rem 0;
+    }
+</style>
+""", unsafe_allow_html=True)
+
+BASE_DIR = pathlib.Path(__file__).resolve().parents[1]
+DATA_DIR = BASE_DIR / "data"
+LATEST_PATH = DATA_DIR / "latest.json"
+PARQUET_PATH = DATA_DIR / "latest.parquet"
+
+# คอลัมน์ที่หน้านี้ใช้จริง - เก็บลง parquet แค่นี้พอ อ่านกลับก็เบากว่า
+_WANTED_COLS = ['station_id', 'name_th', 'name', 'solar_volt_v', 'battery_v',
+                'status', 'timestamp']
+
+
+def _build_frame(json_path):
+    """parse latest.json เป็น DataFrame (ส่วนที่แพงที่สุดของการโหลด)"""
+    with open(json_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    # Extract station data
+    stations = data.get("stations", [])
+    df = pd.DataFrame(stations)
+
+    # Normalize station ID column
+    if 'station_id' not in df.columns:
+        if 'station_code' in df.columns:
+            df['station_id'] = df['station_code']
+        elif 'code' in df.columns:
+            df['station_id'] = df['code']
+
+    # Convert date columns - date_iso เป็น ISO8601 เสมอ บอก format ให้ parser
+    # C วิ่งรอบเดียว ไม่ต้องเดารูปแบบต่อค่า (cache=True ช่วยค่าซ้ำ) และ
+    # parquet cache เก็บผลเป็น datetime64 ไว้ให้รอบถัดไปเลย
+    if 'date_iso' in df.columns:
+        df['timestamp'] = pd.to_datetime(df['date_iso'], format='ISO8601',
+                                         errors='coerce', cache=True)
+    elif 'date' in df.columns:
+        df['timestamp'] = pd.to_datetime(df['date'], errors='coerce', cache=True)
+
+    # Downcast แรงดันเป็น float32 - ความละเอียด 2 ทศนิยมของเซ็นเซอร์เหลือเฟือ
+    # byte ที่ทุก scan/percentile ต้องอ่านและ payload กราฟลดลงครึ่ง
+    for c in ('solar_volt_v', 'battery_v'):
+        if c in df.columns:
+            df[c] = pd.to_numeric(df[c], errors='coerce').astype('float32')
+    if 'station_id' in df.columns:
+        df['station_id'] = df['station_id'].astype('category')
+
+    # status เป็น Categorical: เทียบ/นับด้วยรหัสจำนวนเต็มแทน string ต่อแถว
+    # (parquet เก็บ dictionary type ไว้ให้ อ่านกลับก็ยังเป็น category)
+    if 'status' in df.columns:
+        df['status'] = df['status'].astype('category')
+
+    return df[[c for c in _WANTED_COLS if c in df.columns]]
+
+
+def _ensure_parquet(json_path, parquet_path):
+    """สร้าง/อัปเดต parquet cache ของ latest.json (คีย์ด้วย mtime)
+
+    JSON ต้อง tokenize ข้อความทั้งไฟล์และ parse วันที่ใหม่ทุกรอบ ส่วน parquet
+    เก็บคอลัมน์แบบ typed (datetime64 ลงดิสก์ตรง ๆ) อ่านกลับแทบไม่มีต้นทุน"""
+    if (parquet_path.exists()
+            and parquet_path.stat().st_mtime_ns >= json_path.stat().st_mtime_ns):
+        return
+    _build_frame(json_path).to_parquet(parquet_path, compression='zstd')
+
+
+@st.cache_data(ttl=600)
+def load_latest():
+    """โหลดข้อมูลจาก data/latest.json (ผ่าน parquet cache ถ้ามี pyarrow)"""
+    try:
+        if pyarrow is not None:
+            _ensure_parquet(LATEST_PATH, PARQUET_PATH)
+            df = pd.read_parquet(PARQUET_PATH)
+        else:
+            df = _build_frame(LATEST_PATH)
+
+        # Filter out stations with missing solar data
+        df = df.dropna(subset=['solar_volt_v', 'timestamp'])
+
+        # เรียงตาม timestamp ตั้งแต่โหลด - ตัวกรองช่วงวันที่ใน main จะ
+        # slice ด้วย searchsorted ได้เลย
+        df = df.sort_values('timestamp', kind='stable', ignore_index=True)
+
+        return df
+
+    except Exception as e:
+        st.error(f"❌ โหลดข้อมูลล้มเหลว: {e}")
+        return pd.DataFrame()
+
+def calculate_solar_metrics(df, df_latest=None):
+    """คำนวณ metrics สำหรับ solar panel performance
+
+    ส่ง df_latest (แถวล่าสุดต่อสถานี) เข้ามาได้ถ้า caller คำนวณไว้แล้ว
+    จะได้ไม่ sort/dedup ซ้ำ"""
+    if df.empty:
+        return {}
+
+    # Get the latest reading for each station to avoid counting duplicates
+    # (drop_duplicates หลัง stable sort ถูกกว่า groupby().tail(1) ที่ต้อง
+    # สร้าง metadata ของกลุ่มทั้งชุด)
+    if df_latest is None:
+        df_latest = (df.sort_values('timestamp', kind='stable')
+                     .drop_duplicates('station_id', keep='last'))
+
+    # Basic statistics - ดึง array ออกมาครั้งเดียวแล้วคิดทุกตัวจากมัน
+    # (percentile ทั้งชุดแชร์การ sort เดียว แทน mean/min/max/std/median/
+    # quantile ที่แยกกวาดคอลัมน์คนละรอบ)
+    arr = df_latest['solar_volt_v'].to_numpy(dtype=np.float64, copy=False)
+    arr = arr[~np.isnan(arr)]
+    p0, p25, p50, p75, p100 = np.percentile(arr, [0, 25, 50, 75, 100])
+    metrics = {
+        # หนึ่งแถวต่อสถานีแล้ว len ก็คือจำนวนสถานี ไม่ต้อง hash ด้วย nunique
+        'total_stations': len(df_latest),
+        'avg_solar_voltage': arr.mean(),
+        'min_solar_voltage': p0,
+        'max_solar_voltage': p100,
+        'std_solar_voltage': arr.std(ddof=1),
+        'median_solar_voltage': p50,
+        'p25_solar_voltage': p25,
+        'p75_solar_voltage': p75
+    }
+    
+    # Count stations by voltage ranges - df_latest มีสถานีละแถวเดียวแล้ว
+    # จัด band ด้วยผลบวกของการเทียบสามครั้งแล้ว bincount รอบเดียว แทน
+    # boolean mask สี่ชุด + nunique (ซึ่ง hash ทั้งคอลัมน์ซ้ำทุกครั้ง)
+    # ขอบเขตเดิมไม่สมมาตร ([13,15) แต่ [15,18]) จึงใช้เทียบตรง ๆ แทน pd.cut
+    v = df_latest['solar_volt_v'].to_numpy()
+    band = (v >= 13.0).astype(np.int8) + (v >= 15.0) + (v > 18.0)
+    counts = np.bincount(band, minlength=4)
+    metrics['critical_low'] = int(counts[0])
+    metrics['low'] = int(counts[1])
+    metrics['normal'] = int(counts[2])
+    metrics['high'] = int(counts[3])
+    
+    # Count by status - value_counts เดียวบนรหัส category แทน mask สามชุด
+    # (หนึ่งแถวต่อสถานีอยู่แล้ว นับแถวตรง ๆ ได้เลย)
+    if 'status' in df_latest.columns:
+        vc = df_latest['status'].value_counts()
+        metrics['timeout_count'] = int(vc.get('TIMEOUT', 0))
+        metrics['disconnect_count'] = int(vc.get('DISCONNECT', 0))
+        metrics['online_count'] = int(vc.get('ONLINE', 0))
+    
+    return metrics
+
+def _max_consec_loop(is_low, starts, ends, out):
+    """run ต่ำที่ยาวสุดของแต่ละสถานี - แต่ละกลุ่มคือช่วง [starts, ends)
+    บน array รายวันที่ต่อกันเป็นผืนเดียว เขียนผลลง slot ของตัวเอง"""
+    for k in prange(starts.shape[0]):
+        run = 0
+        mx = 0
+        for i in range(starts[k], ends[k]):
+            if is_low[i]:
+                run += 1
+                if run > mx:
+                    mx = run
+            else:
+                run = 0
+        out[k] = mx
+
+
+if njit is not None:
+    _max_consec_kernel = njit(cache=True)(_max_consec_loop)
+else:
+    _max_consec_kernel = _max_consec_loop
+
+
+def detect_low_solar_stations(df, threshold_days=3, voltage_threshold=13.0):
+    """ตรวจจับสถานีที่มีแรงดันโซลาร์ต่ำเป็นเวลาติดต่อง
+
+    คิดเป็น run-length บนตารางรายวันทั้งชุดในรอบเดียว: วันไหนมีค่าต่ำสัก
+    ครั้งนับเป็นวันต่ำ แล้วหา run ต่ำที่ยาวสุดต่อสถานีด้วย cumsum บน
+    mask รอยต่อของ run (ไม่มี loop ระดับ Python ต่อสถานีอีก)"""
+    if df.empty:
+        return pd.DataFrame()
+
+    df_sorted = df.sort_values(['station_id', 'timestamp'], kind='stable')
+
+    # ตารางรายวัน: (station_id, date) -> มีค่าต่ำกว่า threshold ไหม
+    date = df_sorted['timestamp'].dt.normalize()
+    daily = (df_sorted['solar_volt_v'].lt(voltage_threshold)
+             .groupby([df_sorted['station_id'], date], observed=True).any()
+             .reset_index(name='is_low')
+             .rename(columns={'timestamp': 'date'}))
+
+    if njit is not None:
+        # เส้นทาง numba: เดิน array uint8 รายวันตรง ๆ ไม่มี groupby ซ้อน
+        codes, uniques = pd.factorize(daily['station_id'])
+        boundaries = np.flatnonzero(np.diff(codes)) + 1
+        starts = np.concatenate(([0], boundaries))
+        ends = np.concatenate((boundaries, [len(codes)]))
+        is_low = daily['is_low'].to_numpy(np.uint8)
+        mx = np.zeros(len(starts), np.int64)
+        _max_consec_kernel(is_low, starts, ends, mx)
+        max_consecutive = pd.Series(mx, index=uniques)
+    else:
+        # run ใหม่เมื่อค่า is_low เปลี่ยนหรือขึ้นสถานีใหม่ (shift ภายในสถานี
+        # ให้ NaN ที่หัวกลุ่ม จึงนับเป็นรอยต่อเสมอ) - cumsum ได้ id ไม่ซ้ำข้ามสถานี
+        run_id = (daily['is_low']
+                  .ne(daily.groupby('station_id', observed=True)['is_low'].shift())
+                  .cumsum())
+        low_runs = daily.loc[daily['is_low']]
+        if low_runs.empty:
+            return pd.DataFrame()
+        run_len = low_runs.groupby([low_runs['station_id'], run_id[low_runs.index]],
+                                   observed=True).size()
+        max_consecutive = run_len.groupby(level=0, observed=True).max()
+    flagged = max_consecutive[max_consecutive >= threshold_days]
+    if flagged.empty:
+        return pd.DataFrame()
+
+    # แถวล่าสุดของสถานีที่ติดธง (เรียงตาม timestamp ในสถานีอยู่แล้ว)
+    latest = (df_sorted.drop_duplicates('station_id', keep='last')
+              .set_index('station_id').reindex(flagged.index))
+    if 'name_th' in latest.columns:
+        names = latest['name_th']
+    elif 'name' in latest.columns:
+        names = latest['name']
+    else:
+        names = 'Unknown'
+    return pd.DataFrame({
+        'station_id': flagged.index,
+        'station_name': np.asarray(names) if not isinstance(names, str) else names,
+        'consecutive_low_days': flagged.to_numpy(),
+        'latest_solar_voltage': latest['solar_volt_v'].to_numpy(),
+        'latest_battery_voltage': (latest['battery_v'].to_numpy()
+                                   if 'battery_v' in latest.columns else np.nan),
+        'latest_status': (np.asarray(latest['status'])
+                          if 'status' in latest.columns else 'UNKNOWN'),
+        'last_update': latest['timestamp'].to_numpy()
+    })
+
+def _hover_text(frame, with_battery=False):
+    """ประกอบ hover text ทั้งคอลัมน์ด้วย string ops ระดับ C
+    แทน df.apply(lambda ..., axis=1) ที่เรียก Python ต่อแถว"""
+    text = ("Station: " + frame['station_id'].astype(str)
+            + "<br>Solar: "
+            + np.char.mod('%.1f', frame['solar_volt_v'].to_numpy('f8')) + "V")
+    if with_battery:
+        text = (text + "<br>Battery: "
+                + np.char.mod('%.1f', frame['battery_v'].to_numpy('f8')) + "V")
+    return text
+
+
+def create_solar_performance_scatter(df):
+    """สร้างกราฟ Solar Performance vs Issues"""
+    if df.empty:
+        return None
+    
+    if not _PLOTLY_OK:
+        st.error(_PLOTLY_MSG)
+        return None
+    
+    # Filter stations with issues (TIMEOUT or DISCONNECT)
+    df_issues = df[df['status'].isin(['TIMEOUT', 'DISCONNECT'])].copy()
+    df_normal = df[df['status'] == 'ONLINE'].copy()
+    
+    fig = go.Figure()
+    
+    # Add normal stations
+    if not df_normal.empty:
+        fig.add_trace(go.Scatter(
+            x=df_normal['solar_volt_v'],
+            y=np.full(len(df_normal), 1.0, dtype=np.float32),
+            mode='markers',
+            name='ONLINE',
+            marker=dict(
+                color='green',
+                size=8,
+                opacity=0.7
+            ),
+            text=_hover_text(df_normal),
+            hovertemplate='%{text}<extra></extra>'
+        ))
+    
+    # Add TIMEOUT stations
+    timeout_data = df_issues[df_issues['status'] == 'TIMEOUT']
+    if not timeout_data.empty:
+        fig.add_trace(go.Scatter(
+            x=timeout_data['solar_volt_v'],
+            y=np.full(len(timeout_data), 2.0, dtype=np.float32),
+            mode='markers',
+            name='TIMEOUT',
+            marker=dict(
+                color='orange',
+                size=10,
+                opacity=0.8,
+                symbol='triangle-up'
+            ),
+            text=_hover_text(timeout_data),
+            hovertemplate='%{text}<extra></extra>'
+        ))
+    
+    # Add DISCONNECT stations
+    disconnect_data = df_issues[df_issues['status'] == 'DISCONNECT']
+    if not disconnect_data.empty:
+        fig.add_trace(go.Scatter(
+            x=disconnect_data['solar_volt_v'],
+            y=np.full(len(disconnect_data), 3.0, dtype=np.float32),
+            mode='markers',
+            name='DISCONNECT',
+            marker=dict(
+                color='red',
+                size=10,
+                opacity=0.8,
+                symbol='x'
+            ),
+            text=_hover_text(disconnect_data),
+            hovertemplate='%{text}<extra></extra>'
+        ))
+    
+    # Add threshold lines
+    fig.add_vline(x=13.0, line_dash="dash", line_color="red", annotation_text="Min Threshold (13V)")
+    fig.add_vline(x=18.0, line_dash="dash", line_color="orange", annotation_text="Max Threshold (18V)")
+    
+    fig.update_layout(
+        title='Solar Performance vs Station Status',
+        xaxis_title='Solar Panel Voltage (V)',
+        yaxis_title='Station Status',
+        yaxis=dict(
+            tickvals=[1, 2, 3],
+            ticktext=['ONLINE', 'TIMEOUT', 'DISCONNECT']
+        ),
+        hovermode='closest',
+        template='plotly_white',
+        height=400
+    )
+    
+    return fig
+
+def create_solar_battery_correlation(df):
+    """สร้างกราฟ Solar-Battery Correlation"""
+    if df.empty:
+        return None
+    
+    if not _PLOTLY_OK:
+        st.error(_PLOTLY_MSG)
+        return None
+    
+    # Filter out rows with missing battery data
+    df_corr = df.dropna(subset=['battery_v', 'solar_volt_v']).copy()
+    
+    if df_corr.empty:
+        return None
+    
+    fig = go.Figure()
+    
+    # Add scatter plot
+    fig.add_trace(go.Scatter(
+        x=df_corr['solar_volt_v'],
+        y=df_corr['battery_v'],
+        mode='markers',
+        name='Stations',
+        marker=dict(
+            color=df_corr['solar_volt_v'],
+            colorscale='Viridis',
+            size=8,
+            opacity=0.7,
+            colorbar=dict(title="Solar Voltage (V)")
+        ),
+        text=_hover_text(df_corr, with_battery=True),
+        hovertemplate='%{text}<extra></extra>'
+    ))
+    
+    # Add threshold lines
+    fig.add_vline(x=13.0, line_dash="dash", line_color="red", annotation_text="Min Solar (13V)")
+    fig.add_vline(x=18.0, line_dash="dash", line_color="orange", annotation_text="Max Solar (18V)")
+    fig.add_hline(y=12.0, line_dash="dash", line_color="red", annotation_text="Min Battery (12V)")
+    
+    # Calculate and add trend line
+    if len(df_corr) > 1:
+        z = np.polyfit(df_corr['solar_volt_v'], df_corr['battery_v'], 1)
+        p = np.poly1d(z)
+        x_trend = np.linspace(df_corr['solar_volt_v'].min(), df_corr['solar_volt_v'].max(), 100)
+        y_trend = p(x_trend)
+        
+        fig.add_trace(go.Scatter(
+            x=x_trend,
+            y=y_trend,
+            mode='lines',
+            name='Trend Line',
+            line=dict(color='red', width=2, dash='dot')
+        ))
+    
+    fig.update_layout(
+        title='Solar Panel Voltage vs Battery Voltage Correlation',
+        xaxis_title='Solar Panel Voltage (V)',
+        yaxis_title='Battery Voltage (V)',
+        hovermode='closest',
+        template='plotly_white',
+        height=400
+    )
+    
+    return fig
+
+def create_solar_daily_profile(df):
+    """สร้างกราฟ Solar Voltage Daily Profile"""
+    if df.empty:
+        return None
+    
+    if not _PLOTLY_OK:
+        st.error(_PLOTLY_MSG)
+        return None
+    
+    # Create hourly profile - ชั่วโมงเป็น array ชั่วคราว ไม่เขียนคอลัมน์ hour
+    # ใส่ frame ของ caller (mutation ทำให้ข้อมูลใน cache เพี้ยนไปด้วย)
+    hour = df['timestamp'].to_numpy('datetime64[h]').astype('int64') % 24
+    hourly_stats = (pd.DataFrame({'hour': hour,
+                                  'v': df['solar_volt_v'].to_numpy()})
+                    .groupby('hour', sort=True)['v']
+                    .agg(['mean', 'median', 'std'])
+                    .reset_index())
+    
+    fig = go.Figure()
+    
+    # Add median line
+    fig.add_trace(go.Scatter(
+        x=hourly_stats['hour'],
+        y=hourly_stats['median'],
+        mode='lines+markers',
+        name='Median Solar Voltage',
+        line=dict(color='orange', width=3),
+        marker=dict(size=6)
+    ))
+    
+    # Add mean line
+    fig.add_trace(go.Scatter(
+        x=hourly_stats['hour'],
+        y=hourly_stats['mean'],
+        mode='lines',
+        name='Mean Solar Voltage',
+        line=dict(color='blue', width=2, dash='dash')
+    ))
+    
+    # Add confidence interval (±1 std)
+    fig.add_trace(go.Scatter(
+        x=hourly_stats['hour'],
+        y=hourly_stats['mean'] + hourly_stats['std'],
+        mode='lines',
+        line=dict(width=0),
+        showlegend=False,
+        hoverinfo='skip'
+    ))
+    
+    fig.add_trace(go.Scatter(
+        x=hourly_stats['hour'],
+        y=hourly_stats['mean'] - hourly_stats['std'],
+        mode='lines',
+        line=dict(width=0),
+        fill='tonexty',
+        fillcolor='rgba(255,165,0,0.2)',
+        name='±1 Std Dev',
+        hoverinfo='skip'
+    ))
+    
+    # Add threshold lines
+    fig.add_hline(y=13.0, line_dash="dash", line_color="red", annotation_text="Min Threshold (13V)")
+    fig.add_hline(y=18.0, line_dash="dash", line_color="orange", annotation_text="Max Threshold (18V)")
+    
+    fig.update_layout(
+        title='Solar Voltage Daily Profile (Hourly Average)',
+        xaxis_title='Hour of Day',
+        yaxis_title='Solar Panel Voltage (V)',
+        hovermode='x unified',
+        template='plotly_white',
+        height=400
+    )
+    
+    return fig
+
+def create_undercharge_event_rate(df):
+    """สร้างกราฟ Under-charge Event Rate"""
+    if df.empty:
+        return None
+    
+    if not _PLOTLY_OK:
+        st.error(_PLOTLY_MSG)
+        return None
+    
+    # Create daily analysis - คีย์วันที่เป็น Series ชั่วคราว ไม่เขียนคอลัมน์
+    # date ลง frame ของ caller
+    date_key = df['timestamp'].dt.date
+
+    # Count under-charge events per day (solar < 13V AND status is TIMEOUT/DISCONNECT)
+    events_mask = ((df['solar_volt_v'] < 13.0)
+                   & df['status'].isin(['TIMEOUT', 'DISCONNECT']))
+    if not events_mask.any():
+        return None
+
+    event_counts = date_key[events_mask].value_counts().rename('undercharge_events')
+
+    # Calculate total stations per day for percentage (align บนทุกวันที่มีข้อมูล)
+    daily_totals = date_key.value_counts().rename('total_stations')
+    event_stats = (pd.concat([event_counts, daily_totals], axis=1)
+                   .sort_index().rename_axis('date').reset_index())
+    event_stats['undercharge_events'] = event_stats['undercharge_events'].fillna(0)
+    event_stats['event_rate'] = (event_stats['undercharge_events'] / event_stats['total_stations']) * 100
+    
+    fig = make_subplots(
+        rows=2, cols=1,
+        subplot_titles=('Number of Under-charge Events per Day', 'Under-charge Event Rate (%)'),
+        vertical_spacing=0.1
+    )
+    
+    # Add bar chart for event counts
+    fig.add_trace(
+        go.Bar(
+            x=event_stats['date'],
+            y=event_stats['undercharge_events'],
+            name='Event Count',
+            marker_color='red'
+        ),
+        row=1, col=1
+    )
+    
+    # Add line chart for event rate
+    fig.add_trace(
+        go.Scatter(
+            x=event_stats['date'],
+            y=event_stats['event_rate'],
+            mode='lines+markers',
+            name='Event Rate (%)',
+            line=dict(color='orange', width=2),
+            marker=dict(size=6)
+        ),
+        row=2, col=1
+    )
+    
+    fig.update_layout(
+        title='Under-charge Event Analysis (Low Solar + High Timeout/Disconnect)',
+        height=600,
+        template='plotly_white',
+        showlegend=True
+    )
+    
+    fig.update_xaxes(title_text="Date", row=2, col=1)
+    fig.update_yaxes(title_text="Number of Events", row=1, col=1)
+    fig.update_yaxes(title_text="Event Rate (%)", row=2, col=1)
+    
+    return fig
+
+def _df_fingerprint(df):
+    """คีย์ cache ถูก ๆ ของ frame ที่กรองแล้ว แทนการ hash ทั้งก้อน"""
+    if df.empty:
+        return (0,)
+    return (len(df), str(df['timestamp'].max()), float(df['solar_volt_v'].sum()))
+
+
+@st.cache_data(ttl=600, show_spinner=False, hash_funcs={pd.DataFrame: lambda _: 0})
+def _page_stats(fingerprint, df):
+    """metrics + ตารางสถานีโซลาร์ต่ำของ frame ที่กรองแล้ว memoize ตาม
+    fingerprint - เลื่อน widget ไปแล้วเลื่อนกลับค่าเดิมตอบได้ทันที"""
+    df_latest = (df.sort_values('timestamp', kind='stable')
+                 .drop_duplicates('station_id', keep='last'))
+    return calculate_solar_metrics(df, df_latest), detect_low_solar_stations(df)
+
+
+def main():
+    """ฟังก์ชันหลักของ Dashboard"""
+    st.title("☀️ Solar Panel Dashboard")
+    st.caption("การทำงานของแผงโซลาร์สถานีวัดระดับน้ำฝน")
+    
+    # Load data
+    with st.spinner("กำลังโหลดข้อมูลสถานี..."):
+        df = load_latest()
+    
+    if df.empty:
+        st.error("❌ ไม่สามารถโหลดข้อมูลสถานีได้")
+        st.stop()
+    
+    # Create a base dataframe for calculating ONLINE status (not affected by filters)
+    df_base = df.copy()
+    
+    # Calculate ONLINE percentage from base data
+    if 'status' in df_base.columns:
+        total_stations = df_base['station_id'].nunique()
+        online_stations = df_base.loc[df_base['status'].str.upper() == 'ONLINE', 'station_id'].nunique()
+        online_pct = round(100 * online_stations / max(total_stations, 1), 1)
+    else:
+        total_stations = df_base['station_id'].nunique()
+        online_pct = 0.0
+    
+    # Calculate normal voltage percentage from base data
+    if 'solar_volt_v' in df_base.columns:
+        # Group by station to get the latest reading per station
+        df_voltage = df_base.dropna(subset=['solar_volt_v']).copy()
+        if not df_voltage.empty:
+            # Get the latest reading for each station
+            df_voltage = (df_voltage.sort_values('timestamp', kind='stable')
+                          .drop_duplicates('station_id', keep='last'))
+            # หนึ่งแถวต่อสถานีหลัง dedup - นับจาก mask/len ตรง ๆ ได้เลย
+            normal_voltage_count = int(((df_voltage['solar_volt_v'] >= 15.0)
+                                        & (df_voltage['solar_volt_v'] <= 18.0)).sum())
+            valid_voltage_count = len(df_voltage)
+            normal_voltage_pct = round(100 * normal_voltage_count / max(valid_voltage_count, 1), 1)
+        else:
+            normal_voltage_pct = 0.0
+    else:
+        normal_voltage_pct = 0.0
+    
+    # Sidebar filters
+    st.sidebar.header("🔧 ตัวกรองข้อมูล")
+    
+    # Date range filter
+    if 'timestamp' in df.columns:
+        min_date = df['timestamp'].min().date()
+        max_date = df['timestamp'].max().date()
+        
+        selected_date_range = st.sidebar.date_input(
+            "เลือกช่วงวันที่",
+            value=[min_date, max_date],
+            min_value=min_date,
+            max_value=max_date
+        )
+        
+        if len(selected_date_range) == 2:
+            # frame เรียงตาม timestamp จาก load_latest แล้ว - หา [lo, hi)
+            # ด้วย binary search สองครั้ง แทน .dt.date ที่สร้าง object
+            # Python ต่อแถวแล้วเทียบสองรอบ
+            start_date, end_date = selected_date_range
+            ts = df['timestamp'].to_numpy()
+            lo = np.searchsorted(ts, np.datetime64(start_date, 'ns'))
+            hi = np.searchsorted(ts, np.datetime64(end_date, 'ns')
+                                 + np.timedelta64(1, 'D'))
+            df = df.iloc[lo:hi]
+    
+    # Solar voltage range filter
+    voltage_range = st.sidebar.slider(
+        "ช่วงแรงดันโซลาร์ (V)",
+        min_value=float(df['solar_volt_v'].min()),
+        max_value=float(df['solar_volt_v'].max()),
+        value=(float(df['solar_volt_v'].min()), float(df['solar_volt_v'].max()))
+    )
+    
+    df = df[(df['solar_volt_v'] >= voltage_range[0]) & (df['solar_volt_v'] <= voltage_range[1])]
+    
+    # Status filter
+    if 'status' in df.columns:
+        status_options = df['status'].unique().tolist()
+        selected_status = st.sidebar.multiselect(
+            "เลือกสถานะสถานี",
+            options=status_options,
+            default=status_options
+        )
+        df = df[df['status'].isin(selected_status)]
+    
+    # Calculate metrics - ผ่านชั้น memoize ตาม fingerprint ของ frame ที่กรอง
+    metrics, low_solar_stations = _page_stats(_df_fingerprint(df), df)
+    
+    # Display key metrics
+    st.subheader("📊 ภาพรวมสุขภาพแผงโซลาร์")
+    
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        st.metric("จำนวนสถานี", total_stations)
+    
+    with col2:
+        avg_v = metrics.get('avg_solar_voltage', 0)
+        st.metric("แรงดันเฉลี่ย", f"{avg_v:.2f} V")
+    
+    with col3:
+        critical = metrics.get('critical_low', 0)
+        st.metric("แรงดันต่ำวิกฤต", critical, delta=f"{critical} สถานี")
+    
+    with col4:
+        st.metric("สถานีปกติ (ONLINE)", f"{online_pct:.1f}%")
+    
+    # Add a second row for the normal voltage metric
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        st.metric("แรงดันปกติ (15-18V)", f"{normal_voltage_pct:.1f}%")
+    
+    # Solar status distribution
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        # Create pie chart for voltage status
+        status_data = {
+            'วิกฤตต่ำ (<13V)': metrics.get('critical_low', 0),
+            'ต่ำ (13-15V)': metrics.get('low', 0),
+            'ปกติ (15-18V)': metrics.get('normal', 0),
+            'สูง (>18V)': metrics.get('high', 0)
+        }
+        
+        if not _PLOTLY_OK:
+            st.error(_PLOTLY_MSG)
+            return
+        
+        fig_pie = px.pie(
+            values=list(status_data.values()),
+            names=list(status_data.keys()),
+            title="สถานะแรงดันโซลาร์"
+        )
+        fig_pie.update_layout(height=300)
+        st.plotly_chart(fig_pie, width="stretch")
+    
+    with col2:
+        # Display statistics
+        st.subheader("สถิติแรงดันโซลาร์")
+        st.write(f"**ค่าเฉลี่ย:** {metrics.get('avg_solar_voltage', 0):.2f} V")
+        st.write(f"**ค่ามัธยฐาน:** {metrics.get('median_solar_voltage', 0):.2f} V")
+        st.write(f"**ช่วง 25-75%:** {metrics.get('p25_solar_voltage', 0):.2f} - {metrics.get('p75_solar_voltage', 0):.2f} V")
+        st.write(f"**ส่วนเบี่ยงเบนมาตรฐาน:** {metrics.get('std_solar_voltage', 0):.2f} V")
+    
+    # Main charts
+    st.subheader("📈 กราฟวิเคราะห์การทำงานแผงโซลาร์")
+    
+    # Solar Performance vs Issues
+    st.write("### 1. Solar Performance vs Station Issues (solar_volt_v เทียบกับ TIMEOUT/DISCONNECT)")
+    perf_fig = create_solar_performance_scatter(df)
+    if perf_fig:
+        st.plotly_chart(perf_fig, width="stretch")
+    
+    # Solar-Battery Correlation
+    st.write("### 2. Solar-Battery Correlation (solar_volt_v vs battery_v)")
+    corr_fig = create_solar_battery_correlation(df)
+    if corr_fig:
+        st.plotly_chart(corr_fig, width="stretch")
+    
+    # Solar Voltage Daily Profile
+    st.write("### 3. Solar Voltage Daily Profile (แรงดันโซลาร์รายวัน)")
+    profile_fig = create_solar_daily_profile(df)
+    if profile_fig:
+        st.plotly_chart(profile_fig, width="stretch")
+    
+    # Under-charge Event Rate
+    st.write("### 4. Under-charge Event Rate (จำนวนวันที่ Solar ต่ำ + Timeout สูง)")
+    undercharge_fig = create_undercharge_event_rate(df)
+    if undercharge_fig:
+        st.plotly_chart(undercharge_fig, width="stretch")
+    
+    # Low Solar Stations Alert
+    st.subheader("🚨 แจ้งเตือนสถานีที่มีปัญหาแผงโซลาร์")
+    
+    if not low_solar_stations.empty:
+        st.markdown('<div class="critical-box">⚠️ <strong>คำเตือน:</strong> พบสถานีที่มีแรงดันโซลาร์ต่ำเป็นเวลาติดต่อง 3 วันขึ้นไป!</div>', unsafe_allow_html=True)
+        
+        # Format table
+        display_df = low_solar_stations.copy()
+        display_df['latest_solar_voltage'] = display_df['latest_solar_voltage'].round(2)
+        display_df['latest_battery_voltage'] = display_df['latest_battery_voltage'].round(2)
+        display_df['last_update'] = display_df['last_update'].dt.strftime('%Y-%m-%d %H:%M')
+        
+        display_df = display_df.rename(columns={
+            'station_id': 'รหัสสถานี',
+            'station_name': 'ชื่อสถานี',
+            'consecutive_low_days': 'จำนวนวันติดต่อง',
+            'latest_solar_voltage': 'แรงดันโซลาร์ล่าสุด (V)',
+            'latest_battery_voltage': 'แรงดันแบตเตอรี่ล่าสุด (V)',
+            'latest_status': 'สถานะล่าสุด',
+            'last_update': 'อัปเดตล่าสุด'
+        })
+        
+        st.dataframe(display_df, width="stretch", hide_index=True)
+    else:
+        st.markdown('<div class="success-box">✅ ไม่พบสถานีที่มีแรงดันโซลาร์ต่ำเป็นเวลาติดต่อง 3 วันขึ้นไป</div>', unsafe_allow_html=True)
+    
+    # Footer
+    st.markdown("---")
+    st.markdown('<p style="text-align: center; color: #666;">☀️ Solar Panel Dashboard - Real-time Monitoring System</p>', unsafe_allow_html=True)
+
+if __name__ == "__main__":
     main()
\ No newline at end of file
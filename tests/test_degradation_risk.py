@@ -0,0 +1,40 @@
+import pathlib
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+from pages.degradation_risk_dashboard import predict_failure_probability
+
+
+def _sample_frame():
+    """สถานีเดียว 12 แถว (เกิน min_obs) มี TIMEOUT ปนอยู่ ให้เข้าเงื่อนไข
+    สร้างผลทำนายจริง ไม่ใช่แค่ early return"""
+    n = 12
+    status = ['ONLINE'] * n
+    status[5] = 'TIMEOUT'
+    status[9] = 'TIMEOUT'
+    return pd.DataFrame({
+        'station_id': pd.Categorical(['RG001'] * n),
+        'name_th': ['สถานีทดสอบ'] * n,
+        'timestamp': pd.date_range('2026-08-01', periods=n, freq='D'),
+        'battery_v': np.linspace(13.2, 12.4, n).astype('float32'),
+        'solar_volt_v': np.linspace(17.5, 16.1, n).astype('float32'),
+        'status': pd.Categorical(status),
+    })
+
+
+def test_predict_failure_probability_names_station_with_timeouts():
+    result = predict_failure_probability(_sample_frame())
+
+    assert len(result) == 1
+    row = result.iloc[0]
+    assert row['station_id'] == 'RG001'
+    assert row['station_name'] == 'สถานีทดสอบ'
+    assert 0.0 <= row['failure_probability_7d'] <= 1.0
+
+
+def test_predict_failure_probability_empty_frame():
+    assert predict_failure_probability(pd.DataFrame()).empty